@@ -0,0 +1,138 @@
+# admission.py
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from passwords import password_pool
+
+# Token bucket limits for credential-verification endpoints (requests per minute, burst).
+# Per-IP limits are generous because a whole office often shares one NAT address.
+ADMISSION_IP_RATE_PER_MINUTE = float(os.getenv("ADMISSION_IP_RATE_PER_MINUTE", "120"))
+ADMISSION_IP_BURST = float(os.getenv("ADMISSION_IP_BURST", "60"))
+ADMISSION_ACCOUNT_RATE_PER_MINUTE = float(os.getenv("ADMISSION_ACCOUNT_RATE_PER_MINUTE", "10"))
+ADMISSION_ACCOUNT_BURST = float(os.getenv("ADMISSION_ACCOUNT_BURST", "5"))
+ADMISSION_MAX_TRACKED_KEYS = int(os.getenv("ADMISSION_MAX_TRACKED_KEYS", "50000"))
+# In-flight credential checks allowed per hashing worker before shedding
+ADMISSION_CONCURRENCY_PER_WORKER = int(os.getenv("ADMISSION_CONCURRENCY_PER_WORKER", "4"))
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+
+
+class BucketTable:
+    """Token buckets keyed by client, with LRU eviction to bound memory"""
+
+    def __init__(self, rate_per_minute: float, burst: float, max_keys: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _refill(self, key: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+            bucket.updated_at = now
+        return bucket
+
+    def wait(self, key: str, now: float) -> float:
+        """0 if a token is available, else the seconds until one is; takes nothing"""
+        bucket = self._refill(key, now)
+        if bucket.tokens >= 1:
+            return 0.0
+        return (1 - bucket.tokens) / self.rate if self.rate else 60.0
+
+    def take(self, key: str, now: float) -> float:
+        """Take one token; return 0 on success or the seconds until one is available"""
+        wait = self.wait(key, now)
+        if not wait:
+            self._buckets[key].tokens -= 1
+        return wait
+
+
+class AdmissionController:
+    """Sheds credential-verification load before it reaches the bcrypt pool.
+
+    A request must get a token from its IP bucket and, when known, its
+    account bucket; tokens are only taken once both have one, so retries
+    against a throttled account do not drain the IP bucket shared by
+    everyone behind the same NAT. The number of in-flight verifications must stay
+    under a ceiling derived from the hashing pool's worker count.
+    Rejections are fast 429s with Retry-After.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._ip = BucketTable(ADMISSION_IP_RATE_PER_MINUTE, ADMISSION_IP_BURST, ADMISSION_MAX_TRACKED_KEYS)
+        self._account = BucketTable(ADMISSION_ACCOUNT_RATE_PER_MINUTE, ADMISSION_ACCOUNT_BURST, ADMISSION_MAX_TRACKED_KEYS)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.counters = {}
+
+    def _count(self, endpoint: str, outcome: str):
+        key = f"{endpoint}.{outcome}"
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def _shed(self, endpoint: str, reason: str, retry_after: float):
+        self._count(endpoint, f"shed_{reason}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    @contextmanager
+    def admit(self, request: Request, endpoint: str, account: Optional[str] = None):
+        """Hold an admission slot for the duration of the block or raise 429"""
+        now = time.monotonic()
+        ip = request.client.host if request.client else "unknown"
+        with self._lock:
+            if self._in_flight >= self.max_concurrent:
+                self._shed(endpoint, "concurrency", 1)
+            ip_key = f"{endpoint}:{ip}"
+            wait = self._ip.wait(ip_key, now)
+            if wait:
+                self._shed(endpoint, "ip", wait)
+            if account:
+                account_key = f"{endpoint}:{account.lower()}"
+                wait = self._account.wait(account_key, now)
+                if wait:
+                    self._shed(endpoint, "account", wait)
+                self._account.take(account_key, now)
+            self._ip.take(ip_key, now)
+            self._in_flight += 1
+            self._count(endpoint, "admitted")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self._in_flight,
+            "counters": dict(self.counters),
+        }
+
+
+admission = AdmissionController(
+    min(password_pool.capacity, password_pool.max_workers * ADMISSION_CONCURRENCY_PER_WORKER)
+)
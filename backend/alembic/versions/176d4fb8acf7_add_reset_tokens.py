@@ -0,0 +1,37 @@
+"""add_reset_tokens
+
+Revision ID: 176d4fb8acf7
+Revises: 6afbba5c6952
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '176d4fb8acf7'
+down_revision: Union[str, None] = '6afbba5c6952'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'reset_tokens',
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('expires_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('created_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('token_hash'),
+    )
+    op.create_index('idx_reset_token_expires', 'reset_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_reset_token_expires', table_name='reset_tokens')
+    op.drop_table('reset_tokens')
@@ -0,0 +1,46 @@
+"""add_refresh_tokens
+
+Revision ID: 1ad2ac1f3a28
+Revises: 176d4fb8acf7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1ad2ac1f3a28'
+down_revision: Union[str, None] = '176d4fb8acf7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('family_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('expires_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('created_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('used_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('revoked_at', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('idx_refresh_token_hash', 'refresh_tokens', ['token_hash'], unique=True)
+    op.create_index('idx_refresh_token_family', 'refresh_tokens', ['family_id'], unique=False)
+    op.create_index('idx_refresh_token_user', 'refresh_tokens', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_refresh_token_user', table_name='refresh_tokens')
+    op.drop_index('idx_refresh_token_family', table_name='refresh_tokens')
+    op.drop_index('idx_refresh_token_hash', table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
@@ -0,0 +1,84 @@
+"""unique_attendance_session_numbers
+
+Revision ID: 2f07fccff3fa
+Revises: 769e584df339
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f07fccff3fa'
+down_revision: Union[str, None] = '769e584df339'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Concurrent clock-ins on the old code path could give two sessions the
+    # same number or leave several open. Repair those days first: renumber
+    # their sessions by clock-in time, close every open session but the
+    # latest at the clock-in of the session after it, and recompute totals.
+    op.execute("""
+        CREATE TEMP TABLE broken_attendance ON COMMIT DROP AS
+        SELECT attendance_id FROM attendance_sessions
+        GROUP BY attendance_id
+        HAVING count(*) <> count(DISTINCT session_number)
+            OR count(*) FILTER (WHERE clock_out IS NULL) > 1
+    """)
+    op.execute("""
+        UPDATE attendance_sessions s SET
+            session_number = r.rn,
+            clock_out = CASE WHEN s.clock_out IS NULL AND r.next_clock_in IS NOT NULL
+                             THEN r.next_clock_in ELSE s.clock_out END,
+            work_hours = CASE WHEN s.clock_out IS NULL AND r.next_clock_in IS NOT NULL
+                              THEN extract(epoch FROM r.next_clock_in - s.clock_in) / 3600 ELSE s.work_hours END,
+            status = CASE WHEN s.clock_out IS NULL AND r.next_clock_in IS NOT NULL
+                          THEN 'Completed' ELSE s.status END
+        FROM (
+            SELECT id,
+                   row_number() OVER w AS rn,
+                   lead(clock_in) OVER w AS next_clock_in
+            FROM attendance_sessions
+            WHERE attendance_id IN (SELECT attendance_id FROM broken_attendance)
+            WINDOW w AS (PARTITION BY attendance_id ORDER BY clock_in, id)
+        ) r
+        WHERE s.id = r.id
+    """)
+    op.execute("""
+        UPDATE attendance a SET
+            total_sessions = (SELECT count(*) FROM attendance_sessions s WHERE s.attendance_id = a.id),
+            total_work_hours = (SELECT coalesce(sum(s.work_hours), 0) FROM attendance_sessions s WHERE s.attendance_id = a.id)
+        WHERE a.id IN (SELECT attendance_id FROM broken_attendance)
+    """)
+    # Build the unique replacements before dropping the plain indexes they
+    # supersede, so the punch path is never without one
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_attendance_session_number', 'attendance_sessions', ['attendance_id', 'session_number'],
+            unique=True, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'idx_attendance_session_one_open', 'attendance_sessions', ['attendance_id'],
+            unique=True, postgresql_where=sa.text('clock_out IS NULL'), postgresql_concurrently=True,
+        )
+        op.drop_index('idx_attendance_session_attendance', table_name='attendance_sessions', postgresql_concurrently=True)
+        op.drop_index('idx_attendance_session_open', table_name='attendance_sessions', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_attendance_session_open', 'attendance_sessions', ['attendance_id'],
+            postgresql_where=sa.text('clock_out IS NULL'), postgresql_concurrently=True,
+        )
+        op.create_index(
+            'idx_attendance_session_attendance', 'attendance_sessions', ['attendance_id', 'session_number'],
+            postgresql_concurrently=True,
+        )
+        op.drop_index('idx_attendance_session_one_open', table_name='attendance_sessions', postgresql_concurrently=True)
+        op.drop_index('idx_attendance_session_number', table_name='attendance_sessions', postgresql_concurrently=True)
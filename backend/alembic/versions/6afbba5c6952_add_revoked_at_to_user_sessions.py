@@ -0,0 +1,29 @@
+"""add_revoked_at_to_user_sessions
+
+Revision ID: 6afbba5c6952
+Revises: bc4c45fc7dc7
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6afbba5c6952'
+down_revision: Union[str, None] = 'bc4c45fc7dc7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user_sessions', sa.Column('revoked_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    op.create_index('idx_session_revoked_at', 'user_sessions', ['revoked_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_session_revoked_at', table_name='user_sessions')
+    op.drop_column('user_sessions', 'revoked_at')
@@ -0,0 +1,29 @@
+"""add_updated_at_to_calendar_and_leave_types
+
+Revision ID: 71209c5a0865
+Revises: e5a67fac53e8
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '71209c5a0865'
+down_revision: Union[str, None] = 'e5a67fac53e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Part of the ETag validator for GET /holidays, /week-offs and /leave-types
+    for table in ('holidays', 'week_offs', 'leave_types'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    for table in ('leave_types', 'week_offs', 'holidays'):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,27 @@
+"""add_geofence_status_to_attendance_logs
+
+Revision ID: 769e584df339
+Revises: dd0820eac6ce
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '769e584df339'
+down_revision: Union[str, None] = 'dd0820eac6ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing logs stay NULL until revalidate_geofences.py fills them in
+    op.add_column('attendance_logs', sa.Column('geofence_status', sa.String(length=20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('attendance_logs', 'geofence_status')
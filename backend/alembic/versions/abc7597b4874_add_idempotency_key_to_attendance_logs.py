@@ -0,0 +1,31 @@
+"""add_idempotency_key_to_attendance_logs
+
+Revision ID: abc7597b4874
+Revises: e0f8ca17ddbe
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'abc7597b4874'
+down_revision: Union[str, None] = 'e0f8ca17ddbe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('attendance_logs', sa.Column('idempotency_key', sa.String(length=100), nullable=True))
+    op.create_index(
+        'idx_attendance_log_idempotency', 'attendance_logs', ['tenant_id', 'user_id', 'idempotency_key'],
+        unique=True, postgresql_where=sa.text('idempotency_key IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_attendance_log_idempotency', table_name='attendance_logs')
+    op.drop_column('attendance_logs', 'idempotency_key')
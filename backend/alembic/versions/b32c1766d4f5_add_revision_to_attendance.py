@@ -0,0 +1,27 @@
+"""add_revision_to_attendance
+
+Revision ID: b32c1766d4f5
+Revises: 71209c5a0865
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b32c1766d4f5'
+down_revision: Union[str, None] = '71209c5a0865'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Orders presence updates for a day: every punch bumps it under the row lock
+    op.add_column('attendance', sa.Column('revision', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('attendance', 'revision')
@@ -0,0 +1,36 @@
+"""add_authz_versions
+
+Revision ID: bc4c45fc7dc7
+Revises: 206d8abf692d
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bc4c45fc7dc7'
+down_revision: Union[str, None] = '206d8abf692d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'authz_versions',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index('idx_authz_version_updated', 'authz_versions', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_authz_version_updated', table_name='authz_versions')
+    op.drop_table('authz_versions')
@@ -0,0 +1,53 @@
+"""add_attendance_hot_path_indexes
+
+Revision ID: dd0820eac6ce
+Revises: abc7597b4874
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dd0820eac6ce'
+down_revision: Union[str, None] = 'abc7597b4874'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps punches flowing while the indexes build; it cannot
+    # run inside a transaction. If a build fails it leaves an INVALID index
+    # behind: drop it and run the upgrade again.
+    with op.get_context().autocommit_block():
+        # Open session of a day: punch close, current-session
+        op.create_index(
+            'idx_attendance_session_open', 'attendance_sessions', ['attendance_id'],
+            postgresql_where=sa.text('clock_out IS NULL'), postgresql_concurrently=True,
+        )
+        # Sessions of a day in order: my-detail, batch pairing, reconciliation
+        op.create_index(
+            'idx_attendance_session_attendance', 'attendance_sessions', ['attendance_id', 'session_number'],
+            postgresql_concurrently=True,
+        )
+        # A user's logs newest first: my-logs, idempotency lookups by user
+        op.create_index(
+            'idx_attendance_log_user_timestamp', 'attendance_logs', ['tenant_id', 'user_id', 'timestamp'],
+            postgresql_concurrently=True,
+        )
+        # Logs of a day: my-detail
+        op.create_index(
+            'idx_attendance_log_attendance', 'attendance_logs', ['attendance_id', 'timestamp'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_attendance_log_attendance', table_name='attendance_logs', postgresql_concurrently=True)
+        op.drop_index('idx_attendance_log_user_timestamp', table_name='attendance_logs', postgresql_concurrently=True)
+        op.drop_index('idx_attendance_session_attendance', table_name='attendance_sessions', postgresql_concurrently=True)
+        op.drop_index('idx_attendance_session_open', table_name='attendance_sessions', postgresql_concurrently=True)
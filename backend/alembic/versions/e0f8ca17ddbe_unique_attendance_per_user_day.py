@@ -0,0 +1,65 @@
+"""unique_attendance_per_user_day
+
+Revision ID: e0f8ca17ddbe
+Revises: 1ad2ac1f3a28
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e0f8ca17ddbe'
+down_revision: Union[str, None] = '1ad2ac1f3a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The old clock-in path could race and create two rows for the same
+    # user and day. Fold duplicates into the earliest row before adding the
+    # constraint: move their sessions and logs over, then renumber sessions.
+    op.execute("""
+        CREATE TEMP TABLE attendance_dupes ON COMMIT DROP AS
+        SELECT id, keeper_id FROM (
+            SELECT id,
+                   first_value(id) OVER (
+                       PARTITION BY tenant_id, user_id, date
+                       ORDER BY created_at NULLS LAST, id
+                   ) AS keeper_id
+            FROM attendance
+        ) ranked
+        WHERE id <> keeper_id
+    """)
+    op.execute("""
+        UPDATE attendance_sessions s SET attendance_id = d.keeper_id
+        FROM attendance_dupes d WHERE s.attendance_id = d.id
+    """)
+    op.execute("""
+        UPDATE attendance_logs l SET attendance_id = d.keeper_id
+        FROM attendance_dupes d WHERE l.attendance_id = d.id
+    """)
+    op.execute("""
+        UPDATE attendance_sessions s SET session_number = r.rn
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY attendance_id ORDER BY clock_in, id) AS rn
+            FROM attendance_sessions
+            WHERE attendance_id IN (SELECT DISTINCT keeper_id FROM attendance_dupes)
+        ) r
+        WHERE s.id = r.id
+    """)
+    op.execute("""
+        UPDATE attendance a SET
+            total_sessions = (SELECT count(*) FROM attendance_sessions s WHERE s.attendance_id = a.id),
+            total_work_hours = (SELECT coalesce(sum(s.work_hours), 0) FROM attendance_sessions s WHERE s.attendance_id = a.id)
+        WHERE a.id IN (SELECT DISTINCT keeper_id FROM attendance_dupes)
+    """)
+    op.execute("DELETE FROM attendance WHERE id IN (SELECT id FROM attendance_dupes)")
+    op.create_index('idx_attendance_tenant_user_date', 'attendance', ['tenant_id', 'user_id', 'date'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_attendance_tenant_user_date', table_name='attendance')
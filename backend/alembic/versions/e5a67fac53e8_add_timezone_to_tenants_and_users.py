@@ -0,0 +1,29 @@
+"""add_timezone_to_tenants_and_users
+
+Revision ID: e5a67fac53e8
+Revises: 2f07fccff3fa
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a67fac53e8'
+down_revision: Union[str, None] = '2f07fccff3fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL everywhere keeps today's behaviour: attendance days are DEFAULT_TIMEZONE (UTC) days
+    op.add_column('tenants', sa.Column('timezone', sa.String(length=64), nullable=True))
+    op.add_column('users', sa.Column('timezone', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'timezone')
+    op.drop_column('tenants', 'timezone')
@@ -0,0 +1,109 @@
+# attendance_detail.py
+"""Attendance day detail (the day, its sessions, logs and policy) built as JSON by Postgres.
+
+One statement returns the finished response body as text: sessions and
+logs are ``json_agg`` subqueries correlated on the attendance row, and each
+row is rendered with ``json_build_object`` over the fields of its response
+schema, so the JSON has the same keys the Pydantic models would produce.
+Timestamps are formatted in SQL the way Pydantic writes them (UTC with a
+``Z``, fractional seconds only when there are any), not as json_build_object's
+``+00:00``.
+Nothing is hydrated into ORM objects or validated row by row in Python.
+"""
+from datetime import date
+from itertools import chain
+from typing import Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy import DateTime, Text, case, cast, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+
+from models import Attendance, AttendanceLog, AttendanceSession, Policy
+from schemas import AttendanceLogResponse, AttendanceResponse, AttendanceSessionResponse
+
+EMPTY_JSON_LIST = literal_column("'[]'::json")
+
+# to_char patterns for ISO 8601 UTC, with and without microseconds
+UTC_SECONDS = 'YYYY-MM-DD"T"HH24:MI:SS"Z"'
+UTC_MICROSECONDS = 'YYYY-MM-DD"T"HH24:MI:SS.US"Z"'
+
+
+def _utc_timestamp(column):
+    """A timestamptz as Pydantic serializes it, e.g. 2026-10-18T09:00:00Z or ...:00.250000Z"""
+    utc = func.timezone("UTC", column)
+    return case(
+        (func.date_trunc("second", utc) == utc, func.to_char(utc, UTC_SECONDS)),
+        else_=func.to_char(utc, UTC_MICROSECONDS),
+    )
+
+
+def _json_value(column):
+    return _utc_timestamp(column) if isinstance(column.type, DateTime) else column
+
+
+def _json_object(table, model: Type[BaseModel]):
+    """json_build_object of ``table``'s columns named like ``model``'s fields"""
+    return func.json_build_object(*chain.from_iterable(
+        (literal(name), _json_value(table.c[name])) for name in model.model_fields
+    ))
+
+
+def _day_json():
+    """Correlated JSON for one attendance row, plus the table it selects from"""
+    day = Attendance.__table__.alias("a")
+    session = AttendanceSession.__table__.alias("s")
+    log = AttendanceLog.__table__.alias("l")
+    policy = Policy.__table__.alias("p")
+
+    sessions = select(func.coalesce(
+        func.json_agg(aggregate_order_by(_json_object(session, AttendanceSessionResponse), session.c.session_number)),
+        EMPTY_JSON_LIST
+    )).where(session.c.attendance_id == day.c.id).scalar_subquery()
+    logs = select(func.coalesce(
+        func.json_agg(aggregate_order_by(_json_object(log, AttendanceLogResponse), log.c.timestamp.desc())),
+        EMPTY_JSON_LIST
+    )).where(log.c.attendance_id == day.c.id).scalar_subquery()
+    policy_info = select(
+        func.json_build_object(literal("name"), policy.c.name, literal("rules"), policy.c.rules)
+    ).where(policy.c.id == day.c.policy_id).scalar_subquery()
+
+    body = func.json_build_object(
+        literal("attendance"), _json_object(day, AttendanceResponse),
+        literal("sessions"), sessions,
+        literal("logs"), logs,
+        literal("shift_info"), None,
+        literal("policy_info"), policy_info,
+    )
+    return day, body
+
+
+def day_detail_query(tenant_id, user_id, day: date):
+    attendance, body = _day_json()
+    return select(cast(body, Text)).where(
+        attendance.c.tenant_id == tenant_id,
+        attendance.c.user_id == user_id,
+        attendance.c.date == day
+    )
+
+
+def range_detail_query(tenant_id, user_id, start: date, end: date):
+    attendance, body = _day_json()
+    return select(
+        cast(func.coalesce(func.json_agg(aggregate_order_by(body, attendance.c.date)), EMPTY_JSON_LIST), Text)
+    ).where(
+        attendance.c.tenant_id == tenant_id,
+        attendance.c.user_id == user_id,
+        attendance.c.date >= start,
+        attendance.c.date <= end
+    )
+
+
+def day_detail_json(db: Session, tenant_id, user_id, day: date) -> Optional[str]:
+    """Detail of one day as a JSON document, or None if the user has no attendance that day"""
+    return db.execute(day_detail_query(tenant_id, user_id, day)).scalar()
+
+
+def range_detail_json(db: Session, tenant_id, user_id, start: date, end: date) -> str:
+    """Detail of every day with attendance in ``start``..``end`` as one JSON list, oldest first"""
+    return db.execute(range_detail_query(tenant_id, user_id, start, end)).scalar()
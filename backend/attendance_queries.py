@@ -0,0 +1,110 @@
+# attendance_queries.py
+"""Statements for the attendance hot paths.
+
+main.py executes these and check_query_plans.py EXPLAINs the very same
+builders, so the plan check always covers the SQL the API actually sends.
+"""
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import extract, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from fast_json import response_columns
+from models import Attendance, AttendanceLog, AttendanceSession
+from pagination import newest_first
+from schemas import AttendanceLogResponse, AttendanceResponse
+from timeutils import between
+
+
+def upsert_day(attendance_id, tenant_id, user_id, day: date, new_sessions: int):
+    """Get or create the user's attendance row for ``day``, counting ``new_sessions``.
+
+    Returns (id, total_sessions, total_work_hours, status, revision); the
+    upsert also locks the row, so one user's punches are applied one after
+    another and each gets the next revision of the day.
+    """
+    return (
+        pg_insert(Attendance)
+        .values(
+            id=attendance_id,
+            tenant_id=tenant_id,
+            user_id=user_id,
+            date=day,
+            status="Present",
+            total_work_hours=0.0,
+            total_sessions=new_sessions,
+            revision=1,
+        )
+        .on_conflict_do_update(
+            index_elements=[Attendance.tenant_id, Attendance.user_id, Attendance.date],
+            set_={
+                "total_sessions": func.coalesce(Attendance.total_sessions, 0) + new_sessions,
+                "revision": Attendance.revision + 1,
+                "updated_at": func.now(),
+            },
+        )
+        .returning(
+            Attendance.id, Attendance.total_sessions, Attendance.total_work_hours, Attendance.status, Attendance.revision
+        )
+    )
+
+
+def close_open_session(attendance_id, now_utc: datetime):
+    """Close the day's open session and add its hours to the day's total in one statement.
+
+    Returns (session_id, total_work_hours), or no row if nothing was open,
+    so the cost does not grow with the number of sessions in the day.
+    """
+    closed = (
+        update(AttendanceSession)
+        .where(
+            AttendanceSession.attendance_id == attendance_id,
+            AttendanceSession.clock_out.is_(None)
+        )
+        .values(
+            clock_out=now_utc,
+            work_hours=extract("epoch", literal(now_utc) - AttendanceSession.clock_in) / 3600,
+            status="Completed",
+        )
+        .returning(AttendanceSession.id, AttendanceSession.work_hours)
+        .cte("closed_session")
+    )
+    delta = select(
+        func.sum(closed.c.work_hours).label("hours"),
+        func.count().label("closed"),
+        func.array_agg(closed.c.id)[1].label("session_id"),
+    ).subquery("delta")
+    return (
+        update(Attendance)
+        .where(Attendance.id == attendance_id, delta.c.closed > 0)
+        .values(total_work_hours=func.coalesce(Attendance.total_work_hours, 0.0) + delta.c.hours)
+        .returning(delta.c.session_id, Attendance.total_work_hours)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def my_records_query(tenant_id, user_id, start_date: Optional[date], end_date: Optional[date], cursor: Optional[str]):
+    """The user's attendance days in the response's columns, newest first from ``cursor``"""
+    table = Attendance.__table__
+    query = select(*response_columns(table, AttendanceResponse)).where(
+        table.c.tenant_id == tenant_id,
+        table.c.user_id == user_id
+    )
+    if start_date:
+        query = query.where(table.c.date >= start_date)
+    if end_date:
+        query = query.where(table.c.date <= end_date)
+    return newest_first(query, table.c.date, table.c.id, cursor, date)
+
+
+def my_logs_query(tenant_id, user_id, start_date: Optional[date], end_date: Optional[date], tz_name, cursor: Optional[str]):
+    """The user's punch logs in the response's columns, newest first from ``cursor``"""
+    table = AttendanceLog.__table__
+    query = select(*response_columns(table, AttendanceLogResponse)).where(
+        table.c.tenant_id == tenant_id,
+        table.c.user_id == user_id
+    )
+    # Dates are the user's local days, turned into a UTC range on the bare column
+    query = query.where(*between(table.c.timestamp, start_date, end_date, tz_name))
+    return newest_first(query, table.c.timestamp, table.c.id, cursor, datetime)
@@ -1,16 +1,22 @@
 # auth.py
-from datetime import datetime, timedelta
-from typing import Optional, List
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass
+from typing import Optional, List, Tuple
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import func, select, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from functools import wraps
 import os
+import threading
+import time
 import uuid
 
 from database import get_db
-from models import User, UserSession
+from models import User, UserSession, UserRole, Role, Department, AuthzVersion, Tenant
+from cache_utils import TTLCache
 import hashlib
 
 # JWT Configuration
@@ -18,8 +24,216 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Authenticated-principal cache (per worker)
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+# How often each worker pulls authorization-version changes from the database
+AUTHZ_VERSION_REFRESH_SECONDS = float(os.getenv("AUTHZ_VERSION_REFRESH_SECONDS", "5"))
+# Re-read this much history on every incremental refresh so rows committed late are not missed
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+# Verified-JWT memo cache (per worker), keyed by token digest
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "20000"))
+
+# How often each worker pulls newly revoked sessions into its denylist
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+
 security = HTTPBearer()
 
+@dataclass(frozen=True)
+class Principal:
+    """Resolved identity of an authenticated user, cheap to cache and share"""
+    id: uuid.UUID
+    tenant_id: Optional[uuid.UUID]
+    email: str
+    username: str
+    is_active: bool
+    role_names: Tuple[str, ...]
+    department_id: Optional[uuid.UUID] = None
+    branch_id: Optional[uuid.UUID] = None
+    authz_version: int = 0
+    timezone: Optional[str] = None  # user's, else tenant's; None means DEFAULT_TIMEZONE
+
+class AuthzVersionTable:
+    """In-memory copy of authz_versions, refreshed incrementally.
+
+    Users without a row are at version 0. Versions only ever grow, so
+    re-applying overlapping refresh windows is harmless.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._versions = {}
+        self._watermark = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def _apply(self, user_id, version):
+        key = str(user_id)
+        if version > self._versions.get(key, 0):
+            self._versions[key] = version
+
+    def refresh(self, db: Session):
+        query = db.query(AuthzVersion.user_id, AuthzVersion.version, AuthzVersion.updated_at)
+        if self._watermark is not None:
+            query = query.filter(AuthzVersion.updated_at > self._watermark - REFRESH_OVERLAP)
+        rows = query.all()
+        with self._lock:
+            for user_id, version, updated_at in rows:
+                self._apply(user_id, version)
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+            self.refreshes += 1
+
+    def maybe_refresh(self, db: Session):
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        self._next_refresh = now + self.refresh_seconds
+        self.refresh(db)
+
+    def current(self, db: Session, user_id) -> int:
+        self.maybe_refresh(db)
+        return self._versions.get(str(user_id), 0)
+
+    def note(self, user_id, version: int):
+        """Record a version this worker just committed"""
+        with self._lock:
+            self._apply(user_id, version)
+
+    def stats(self) -> dict:
+        return {"users": len(self._versions), "refreshes": self.refreshes}
+
+authz_versions = AuthzVersionTable(AUTHZ_VERSION_REFRESH_SECONDS)
+
+principal_cache = TTLCache(PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CACHE_TTL_SECONDS)
+verified_token_cache = TTLCache(JWT_CACHE_MAX_ENTRIES, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def _principal_key(user_id, tenant_id):
+    return (str(user_id), str(tenant_id))
+
+def load_principal(db: Session, user_id, tenant_id) -> Optional[Principal]:
+    """Resolve a principal with a single query (user, roles, branch and timezone)"""
+    row = db.query(
+        User.id,
+        User.tenant_id,
+        User.email,
+        User.username,
+        User.is_active,
+        User.department_id,
+        Department.branch_id,
+        func.array_remove(func.array_agg(Role.name), None),
+        func.coalesce(User.timezone, Tenant.timezone),
+    ).outerjoin(
+        Department, Department.id == User.department_id
+    ).outerjoin(
+        Tenant, Tenant.id == User.tenant_id
+    ).outerjoin(
+        UserRole, UserRole.user_id == User.id
+    ).outerjoin(
+        Role, Role.id == UserRole.role_id
+    ).filter(
+        User.id == user_id,
+        User.tenant_id == tenant_id
+    ).group_by(User.id, Department.branch_id, Tenant.timezone).first()
+    if row is None:
+        return None
+    return Principal(
+        id=row[0],
+        tenant_id=row[1],
+        email=row[2],
+        username=row[3],
+        is_active=bool(row[4]),
+        role_names=tuple(row[7] or ()),
+        department_id=row[5],
+        branch_id=row[6],
+        authz_version=authz_versions.current(db, row[0]),
+        timezone=row[8],
+    )
+
+def _optional_uuid(value):
+    return uuid.UUID(value) if value else None
+
+def principal_from_claims(payload: dict, version: int) -> Principal:
+    """Rebuild a principal from the claims of a token that is still current"""
+    return Principal(
+        id=uuid.UUID(payload["sub"]),
+        tenant_id=_optional_uuid(payload.get("tenant_id")),
+        email=payload.get("email", ""),
+        username=payload.get("username", ""),
+        is_active=True,
+        role_names=tuple(payload["roles"]),
+        department_id=_optional_uuid(payload.get("department_id")),
+        branch_id=_optional_uuid(payload.get("branch_id")),
+        authz_version=version,
+        timezone=payload.get("tz"),
+    )
+
+def issue_access_token(db: Session, user: User) -> str:
+    """Create an access token carrying role claims and the user's authorization version"""
+    principal = load_principal(db, user.id, user.tenant_id)
+    if principal is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return access_token_for(principal)
+
+def access_token_for(principal: Principal) -> str:
+    """Create an access token from an already resolved principal"""
+    return create_access_token(data={
+        "sub": str(principal.id),
+        "tenant_id": str(principal.tenant_id),
+        "email": principal.email,
+        "username": principal.username,
+        "roles": list(principal.role_names),
+        "department_id": str(principal.department_id) if principal.department_id else None,
+        "branch_id": str(principal.branch_id) if principal.branch_id else None,
+        "av": principal.authz_version,
+        "tz": principal.timezone,
+    })
+
+def _bump_statement(rows):
+    stmt = pg_insert(AuthzVersion).from_select(["user_id", "tenant_id", "version"], rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[AuthzVersion.user_id],
+        set_={"version": AuthzVersion.version + 1, "updated_at": func.now()},
+    ).returning(AuthzVersion.user_id, AuthzVersion.version)
+
+def _commit_bumps(db: Session, result, tenant_id):
+    bumped = result.all()
+    db.commit()
+    for user_id, version in bumped:
+        authz_versions.note(user_id, version)
+        invalidate_principal(user_id, tenant_id)
+
+def bump_authz_version(db: Session, user_id, tenant_id):
+    """Bump a user's authorization version and commit the pending changes with it.
+
+    Tokens issued before the bump no longer match and are re-resolved from
+    the database once instead of being trusted until they expire.
+    """
+    rows = select(literal(user_id, AuthzVersion.user_id.type), literal(tenant_id, AuthzVersion.tenant_id.type), literal(1))
+    _commit_bumps(db, db.execute(_bump_statement(rows)), tenant_id)
+
+def bump_authz_versions_for_role(db: Session, role_id, tenant_id):
+    """Bump every holder of a role; call before the role itself is deleted"""
+    rows = select(UserRole.user_id, literal(tenant_id, AuthzVersion.tenant_id.type), literal(1)).where(UserRole.role_id == role_id)
+    _commit_bumps(db, db.execute(_bump_statement(rows)), tenant_id)
+
+def bump_authz_versions_for_department(db: Session, department_id, tenant_id):
+    """Bump every member of a department (its branch is part of their claims)"""
+    rows = select(User.id, literal(tenant_id, AuthzVersion.tenant_id.type), literal(1)).where(User.department_id == department_id)
+    _commit_bumps(db, db.execute(_bump_statement(rows)), tenant_id)
+
+def bump_authz_versions_for_tenant(db: Session, tenant_id):
+    """Bump every user of a tenant (its timezone is part of their claims)"""
+    rows = select(User.id, literal(tenant_id, AuthzVersion.tenant_id.type), literal(1)).where(User.tenant_id == tenant_id)
+    _commit_bumps(db, db.execute(_bump_statement(rows)), tenant_id)
+
+def invalidate_principal(user_id, tenant_id):
+    """Drop a cached principal after a write that touches the user"""
+    principal_cache.invalidate(_principal_key(user_id, tenant_id))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -33,65 +247,101 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     
     return encoded_jwt
 
+def _token_error(detail: str):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_access_token(token: str, token_hash: Optional[str] = None) -> dict:
+    """Verify a JWT, memoizing the verified claims by token digest.
+
+    A cache hit skips the HMAC check and JSON parsing but still enforces exp;
+    entries never outlive the token itself.
+    """
+    token_hash = token_hash or hash_token(token)
+    cached = verified_token_cache.get(token_hash)
+    if cached is not None:
+        payload, expires_at = cached
+        if expires_at > time.time():
+            return payload
+        verified_token_cache.invalidate(token_hash)
+        raise _token_error("Token expired")
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise _token_error("Token expired")
+    except jwt.InvalidTokenError:
+        raise _token_error("Invalid token")
+    expires_at = payload.get("exp")
+    if expires_at is not None:
+        verified_token_cache.set(token_hash, (payload, expires_at), ttl_seconds=expires_at - time.time())
+    return payload
+
 def verify_token(token: str):
     """Verify JWT token"""
+    payload = decode_access_token(token)
+    user_id: str = payload.get("sub")
+    if user_id is None:
+        raise _token_error("Invalid token")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
         return uuid.UUID(user_id)
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token expired",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    except jwt.JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    except ValueError:
+        raise _token_error("Invalid token")
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
-    """Get current authenticated user, tenant-aware"""
+    """Get current authenticated principal, tenant-aware and cached per worker"""
     token = credentials.credentials
-    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    token_hash = hash_token(token)
+    payload = decode_access_token(token, token_hash)
+    if revocation_list.is_revoked(db, token_hash):
+        raise _token_error("Token revoked")
     user_id: str = payload.get("sub")
     tenant_id: str = payload.get("tenant_id")
     if user_id is None or tenant_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user = db.query(User).filter(User.id == user_id, User.tenant_id == tenant_id).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    if not user.is_active:
+        raise _token_error("Invalid token")
+    try:
+        uuid.UUID(user_id)
+        uuid.UUID(tenant_id)
+    except ValueError:
+        raise _token_error("Invalid token")
+    version = authz_versions.current(db, user_id)
+    if payload.get("av") == version and "roles" in payload:
+        # Token claims are still current: no database work at all
+        return principal_from_claims(payload, version)
+    return resolve_principal(db, user_id, tenant_id, version)
+
+def resolve_principal(db: Session, user_id, tenant_id, version: Optional[int] = None) -> Principal:
+    """Resolve an active principal through the cache, loading it when missing or stale"""
+    if version is None:
+        version = authz_versions.current(db, user_id)
+    key = _principal_key(user_id, tenant_id)
+    principal = principal_cache.get(key)
+    if principal is None or principal.authz_version != version:
+        principal = load_principal(db, user_id, tenant_id)
+        if principal is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        principal_cache.set(key, principal)
+    if not principal.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User account disabled",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
+    return principal
 
 def require_roles(allowed_roles: List[str]):
     """Role-based access control dependency, tenant-aware"""
-    async def role_checker(current_user: User = Depends(get_current_user)):
-        user_roles = [role.name for role in current_user.roles]
+    async def role_checker(current_user: Principal = Depends(get_current_user)):
+        user_roles = current_user.role_names
         if not any(role in user_roles for role in allowed_roles):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -104,10 +354,64 @@ def hash_token(token: str) -> str:
     """Hash token for storage"""
     return hashlib.sha256(token.encode()).hexdigest()
 
-async def create_user_session(user_id: uuid.UUID, token: str, db: Session):
+class RevocationList:
+    """In-memory denylist of revoked session token hashes.
+
+    Request authentication only does a set lookup; the set is refreshed
+    incrementally from user_sessions at most every few seconds, and entries
+    are dropped once the token would have expired anyway.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._revoked = {}
+        self._watermark = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.rejected = 0
+
+    def add(self, token_hash: str, expires_at: datetime):
+        with self._lock:
+            self._revoked[token_hash] = expires_at
+
+    def refresh(self, db: Session):
+        now = datetime.now(timezone.utc)
+        query = db.query(UserSession.token_hash, UserSession.expires_at, UserSession.revoked_at).filter(
+            UserSession.revoked_at.isnot(None),
+            UserSession.expires_at > now
+        )
+        if self._watermark is not None:
+            query = query.filter(UserSession.revoked_at > self._watermark - REFRESH_OVERLAP)
+        rows = query.all()
+        with self._lock:
+            for token_hash, expires_at, revoked_at in rows:
+                self._revoked[token_hash] = expires_at
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+            for token_hash in [h for h, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[token_hash]
+            self.refreshes += 1
+
+    def is_revoked(self, db: Session, token_hash: str) -> bool:
+        now = time.monotonic()
+        if now >= self._next_refresh:
+            self._next_refresh = now + self.refresh_seconds
+            self.refresh(db)
+        if token_hash in self._revoked:
+            self.rejected += 1
+            return True
+        return False
+
+    def stats(self) -> dict:
+        return {"revoked": len(self._revoked), "refreshes": self.refreshes, "rejected": self.rejected}
+
+revocation_list = RevocationList(REVOCATION_REFRESH_SECONDS)
+
+def create_user_session(user_id: uuid.UUID, token: str, db: Session):
     """Create user session record"""
     token_hash = hash_token(token)
-    expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     session = UserSession(
         user_id=user_id,
@@ -119,7 +423,7 @@ async def create_user_session(user_id: uuid.UUID, token: str, db: Session):
     
     return session
 
-async def invalidate_user_session(token: str, db: Session):
+def invalidate_user_session(token: str, db: Session):
     """Invalidate user session"""
     token_hash = hash_token(token)
     session = db.query(UserSession).filter(
@@ -129,28 +433,24 @@ async def invalidate_user_session(token: str, db: Session):
     
     if session:
         session.is_active = False
+        session.revoked_at = datetime.now(timezone.utc)
         db.commit()
+        revocation_list.add(session.token_hash, session.expires_at)
     
     return session
 
-def check_permission(user: User, resource: str, action: str) -> bool:
-    """Check if user has specific permission"""
-    # This would be extended with the Permission model
-    # For now, basic role-based check
-    user_roles = [role.name for role in user.roles]
-    
-    if "admin" in user_roles:
-        return True
-    
-    permission_map = {
-        "manager": ["users:read", "dashboard:read", "reports:read"],
-        "user": ["profile:read", "profile:write"]
-    }
-    
-    required_permission = f"{resource}:{action}"
-    
-    for role in user_roles:
-        if role in permission_map and required_permission in permission_map[role]:
-            return True
-    
-    return False
\ No newline at end of file
+def invalidate_all_user_sessions(user_id: uuid.UUID, db: Session) -> int:
+    """Sign a user out everywhere by revoking every unexpired session"""
+    now = datetime.now(timezone.utc)
+    revoked = db.query(UserSession).filter(
+        UserSession.user_id == user_id,
+        UserSession.is_active == True,
+        UserSession.expires_at > now
+    ).all()
+    for session in revoked:
+        session.is_active = False
+        session.revoked_at = now
+    db.commit()
+    for session in revoked:
+        revocation_list.add(session.token_hash, session.expires_at)
+    return len(revoked)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Attendance day/month detail: ORM queries + Pydantic vs. one JSON statement.
+
+Seeds one user with --days of attendance (two sessions and four logs a day,
+with a policy) into the database at DATABASE_URL, then builds the
+/attendance/my-detail response for random days the old way (attendance row,
+sessions, logs and policy as four ORM queries, then AttendanceDetailResponse)
+and the new way (attendance_detail.day_detail_json), and a whole month both
+ways. Everything runs in one transaction that is rolled back.
+
+Usage:
+    python benchmarks/bench_attendance_detail.py --days 90 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from attendance_detail import day_detail_json, range_detail_json
+from bench_clock_in_out import percentile
+from database import engine, statement_counter
+from models import Attendance, AttendanceLog, AttendanceSession, Policy
+from schemas import AttendanceDetailResponse
+
+SEED_SQL = [
+    """
+    INSERT INTO tenants (id, name, contact_email)
+    VALUES (:tenant_id, 'bench-detail-' || :tag, 'bench-detail@example.com')
+    """,
+    """
+    INSERT INTO users (id, email, username, hashed_password, is_active, tenant_id)
+    VALUES (:user_id, 'detail-' || :tag || '@example.com', 'detail-' || :tag, '!', true, :tenant_id)
+    """,
+    """
+    INSERT INTO policies (id, tenant_id, name, type, level, rules, is_active)
+    VALUES (:policy_id, :tenant_id, 'bench-detail-' || :tag, 'time', 'org',
+            '{"start_time": "09:00", "end_time": "18:00"}', true)
+    """,
+    """
+    INSERT INTO attendance (id, tenant_id, user_id, date, total_work_hours, total_sessions, status, policy_id)
+    SELECT gen_random_uuid(), :tenant_id, :user_id, current_date - d, 8, 2, 'Present', :policy_id
+    FROM generate_series(0, :days - 1) d
+    """,
+    """
+    INSERT INTO attendance_sessions (id, tenant_id, user_id, attendance_id, session_number, clock_in, clock_out, work_hours, status)
+    SELECT gen_random_uuid(), a.tenant_id, a.user_id, a.id, n,
+           a.date + make_interval(hours => n * 5), a.date + make_interval(hours => n * 5 + 4), 4, 'Completed'
+    FROM attendance a CROSS JOIN generate_series(1, 2) n
+    WHERE a.user_id = :user_id
+    """,
+    """
+    INSERT INTO attendance_logs (id, tenant_id, user_id, attendance_id, session_id, action, timestamp, status)
+    SELECT gen_random_uuid(), s.tenant_id, s.user_id, s.attendance_id, s.id, e.action,
+           CASE WHEN e.action = 'clock_in' THEN s.clock_in ELSE s.clock_out END, 'On Time'
+    FROM attendance_sessions s CROSS JOIN (VALUES ('clock_in'), ('clock_out')) e(action)
+    WHERE s.user_id = :user_id
+    """,
+]
+
+
+def orm_detail(session, tenant_id, user_id, day):
+    """The handler before the JSON statement: four queries, then Pydantic"""
+    attendance = session.query(Attendance).filter(
+        Attendance.tenant_id == tenant_id, Attendance.user_id == user_id, Attendance.date == day
+    ).first()
+    if not attendance:
+        return None
+    sessions = session.query(AttendanceSession).filter(
+        AttendanceSession.attendance_id == attendance.id
+    ).order_by(AttendanceSession.session_number).all()
+    logs = session.query(AttendanceLog).filter(
+        AttendanceLog.attendance_id == attendance.id
+    ).order_by(AttendanceLog.timestamp.desc()).all()
+    policy_info = None
+    if attendance.policy_id:
+        policy = session.query(Policy).filter(Policy.id == attendance.policy_id).first()
+        if policy:
+            policy_info = {"name": policy.name, "rules": policy.rules}
+    return AttendanceDetailResponse(
+        attendance=attendance, sessions=sessions, logs=logs, policy_info=policy_info
+    ).model_dump_json()
+
+
+def timed(name, calls):
+    timings = []
+    with statement_counter.track(name):
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - start) * 1000)
+    statements = statement_counter.stats()[name]["statements"] / len(calls)
+    print(f"{name:<24} p50={percentile(timings, 50):7.2f}ms p95={percentile(timings, 95):7.2f}ms "
+          f"mean={statistics.mean(timings):7.2f}ms statements/call={statements:.1f}")
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    tenant_id, user_id = uuid.uuid4(), uuid.uuid4()
+    params = {"tag": uuid.uuid4().hex[:8], "tenant_id": tenant_id, "user_id": user_id,
+              "policy_id": uuid.uuid4(), "days": args.days}
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            print(f"Seeding {args.days} days x 2 sessions x 2 logs...")
+            for statement in SEED_SQL:
+                connection.execute(text(statement), params)
+            session = Session(bind=connection)
+            days = [date.today() - timedelta(days=rng.randrange(args.days)) for _ in range(args.queries)]
+
+            def orm_call(day):
+                orm_detail(session, tenant_id, user_id, day)
+                session.expunge_all()
+
+            timed("day: ORM + Pydantic", [lambda day=day: orm_call(day) for day in days])
+            timed("day: JSON statement", [lambda day=day: day_detail_json(session, tenant_id, user_id, day) for day in days])
+
+            month_start = date.today().replace(day=1) - timedelta(days=1)
+            month_start = month_start.replace(day=1)
+            month_days = [month_start + timedelta(days=n) for n in range(31) if (month_start + timedelta(days=n)).month == month_start.month]
+            months = max(1, args.queries // 20)
+            timed("month: ORM + Pydantic", [lambda: [orm_call(day) for day in month_days] for _ in range(months)])
+            timed("month: JSON statement", [
+                lambda: range_detail_json(session, tenant_id, user_id, month_days[0], month_days[-1]) for _ in range(months)
+            ])
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Attendance detail: ORM vs. JSON aggregation")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--queries", type=int, default=200, help="Day-detail calls per approach")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
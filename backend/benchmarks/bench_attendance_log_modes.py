@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Punch latency and database commit rate under sustained clock-in/out load.
+
+Run it once against a server started with ATTENDANCE_LOG_MODE=sync and once
+with ATTENDANCE_LOG_MODE=write_behind, then compare. Each seeded user
+alternates clock-in and clock-out for --duration seconds. Commits per second
+come from pg_stat_database on the server's DATABASE_URL, so they cover
+every commit: punches, write-behind flushes and anything else running there.
+
+Usage:
+    ATTENDANCE_LOG_MODE=write_behind python main.py   # in another shell
+    python benchmarks/bench_attendance_log_modes.py --users 200 --duration 30
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from sqlalchemy import text
+
+from bench_clock_in_out import cleanup, percentile, seed
+from database import engine
+
+
+def commit_count():
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+        ).scalar()
+
+
+async def user_loop(client, token, deadline, latencies, errors):
+    action = "clock_in"
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post("/attendance/clock-in-out", json={"action": action}, headers=headers)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+            else:
+                latencies.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+        action = "clock_out" if action == "clock_in" else "clock_in"
+
+
+async def run(args, tokens):
+    limits = httpx.Limits(max_connections=args.users + 10, max_keepalive_connections=args.users + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        mode = "unknown (pass --admin-email/--admin-password to read it)"
+        admin_headers = None
+        if args.admin_email:
+            response = await client.post("/auth/login", json={"email": args.admin_email, "password": args.admin_password})
+            response.raise_for_status()
+            admin_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            metrics = (await client.get("/admin/metrics", headers=admin_headers)).json()
+            mode = metrics["attendance_log_writer"]["mode"]
+
+        latencies, errors = [], []
+        commits_before = commit_count()
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(user_loop(client, token, deadline, latencies, errors) for token in tokens))
+        elapsed = time.monotonic() - start
+        # pg_stat counters are published about once a second
+        await asyncio.sleep(1.5)
+        commits = commit_count() - commits_before
+
+        print(f"mode: {mode}")
+        print(f"punches: n={len(latencies)} errors={len(errors)} rate={len(latencies) / elapsed:.0f}/s")
+        if latencies:
+            print(
+                f"  p50={percentile(latencies, 50):.1f}ms "
+                f"p95={percentile(latencies, 95):.1f}ms "
+                f"p99={percentile(latencies, 99):.1f}ms "
+                f"mean={statistics.mean(latencies):.1f}ms"
+            )
+        print(f"database commits: {commits} = {commits / elapsed:.0f}/s "
+              f"({commits / max(1, len(latencies)):.2f} per punch)")
+        if admin_headers:
+            writer = (await client.get("/admin/metrics", headers=admin_headers)).json()["attendance_log_writer"]
+            print(f"log writer: {writer}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare attendance log modes under punch load")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--admin-email")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded tenant and its rows")
+    args = parser.parse_args()
+
+    print(f"Seeding {args.users} users...")
+    tenant_id, tokens = seed(args.users)
+    try:
+        asyncio.run(run(args, tokens))
+    finally:
+        if not args.keep:
+            cleanup(tenant_id)
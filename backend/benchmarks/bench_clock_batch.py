@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Offline clock-event upload benchmark.
+
+Seeds one throwaway user (see bench_clock_in_out.py), generates --events
+alternating clock-in/clock-out events over the past couple of days, and
+uploads them to /attendance/clock-events/batch in batches of --batch-size.
+The same events are then uploaded again to time the idempotent-retry path.
+Reports events per second for both passes.
+
+Usage:
+    python benchmarks/bench_clock_batch.py --events 10000 --batch-size 10000
+"""
+
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from bench_clock_in_out import cleanup, seed
+
+
+def make_events(count, spacing_seconds):
+    start = datetime.now(timezone.utc) - timedelta(seconds=count * spacing_seconds + 60)
+    return [
+        {
+            "idempotency_key": uuid.uuid4().hex,
+            "action": "clock_in" if i % 2 == 0 else "clock_out",
+            "timestamp": (start + timedelta(seconds=i * spacing_seconds)).isoformat(),
+            "latitude": 12.97,
+            "longitude": 77.59,
+            "device_info": "bench",
+        }
+        for i in range(count)
+    ]
+
+
+def upload(client, token, events, batch_size):
+    totals = {"accepted": 0, "duplicates": 0, "rejected": 0}
+    start = time.perf_counter()
+    for offset in range(0, len(events), batch_size):
+        response = client.post(
+            "/attendance/clock-events/batch",
+            json={"events": events[offset:offset + batch_size]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        response.raise_for_status()
+        body = response.json()
+        totals["accepted"] += body["accepted"]
+        totals["duplicates"] += body["duplicates"]
+        totals["rejected"] += len(body["rejected"])
+    return time.perf_counter() - start, totals
+
+
+def main(args):
+    print(f"Seeding 1 user and generating {args.events} events...")
+    tenant_id, tokens = seed(1)
+    try:
+        events = make_events(args.events, args.spacing)
+        with httpx.Client(base_url=args.base_url, timeout=600) as client:
+            for name in ("first upload", "retry (all duplicates)"):
+                elapsed, totals = upload(client, tokens[0], events, args.batch_size)
+                print(f"{name}: {len(events)} events in {elapsed:.2f}s = {len(events) / elapsed:,.0f} events/s "
+                      f"(accepted={totals['accepted']} duplicates={totals['duplicates']} rejected={totals['rejected']})")
+    finally:
+        if not args.keep:
+            cleanup(tenant_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline clock-event batch upload benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--spacing", type=int, default=15, help="Seconds between generated events")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded tenant and its rows")
+    main(parser.parse_args())
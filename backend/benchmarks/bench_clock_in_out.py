@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Clock-in/out benchmark: N users punch at the same moment.
+
+Seeds a throwaway tenant with --users employees directly in the database
+(sharing the server's DATABASE_URL and SECRET_KEY), mints their access
+tokens in-process, then fires every clock-in at once, followed by every
+clock-out. Pass admin credentials to also report the statements and commits
+per punch from the server's /admin/metrics. The tenant and its rows are
+removed afterwards unless --keep is given.
+
+Usage:
+    python benchmarks/bench_clock_in_out.py --users 1000 \\
+        --admin-email admin@example.com --admin-password admin123
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from sqlalchemy import delete
+
+from auth import issue_access_token
+from database import SessionLocal
+from models import Attendance, AttendanceLog, AttendanceSession, Tenant, User
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, latencies, errors, elapsed):
+    print(f"{name}: n={len(latencies)} errors={len(errors)} wall={elapsed:.2f}s "
+          f"throughput={len(latencies) / elapsed:.0f}/s")
+    if latencies:
+        print(
+            f"  p50={percentile(latencies, 50):.1f}ms "
+            f"p95={percentile(latencies, 95):.1f}ms "
+            f"p99={percentile(latencies, 99):.1f}ms "
+            f"max={max(latencies):.1f}ms mean={statistics.mean(latencies):.1f}ms"
+        )
+    if errors:
+        print(f"  first errors: {errors[:5]}")
+
+
+def seed(count):
+    db = SessionLocal()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        tenant = Tenant(name=f"bench-punch-{tag}", contact_email=f"bench-{tag}@example.com")
+        db.add(tenant)
+        db.flush()
+        users = [
+            User(
+                tenant_id=tenant.id,
+                email=f"punch-{tag}-{i}@example.com",
+                username=f"punch-{tag}-{i}",
+                hashed_password="!",
+            )
+            for i in range(count)
+        ]
+        db.add_all(users)
+        db.commit()
+        tokens = [issue_access_token(db, user) for user in users]
+        return tenant.id, tokens
+    finally:
+        db.close()
+
+
+def cleanup(tenant_id):
+    db = SessionLocal()
+    try:
+        for model in (AttendanceLog, AttendanceSession, Attendance, User):
+            db.execute(delete(model).where(model.tenant_id == tenant_id))
+        db.execute(delete(Tenant).where(Tenant.id == tenant_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def punch(client, token, action, latencies, errors):
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            "/attendance/clock-in-out",
+            json={"action": action, "latitude": 12.97, "longitude": 77.59},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            return
+    except httpx.HTTPError as e:
+        errors.append(str(e))
+        return
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def statement_stats(client, admin_token):
+    if not admin_token:
+        return None
+    response = await client.get("/admin/metrics", headers={"Authorization": f"Bearer {admin_token}"})
+    response.raise_for_status()
+    return response.json().get("statements", {}).get("clock_in_out")
+
+
+async def main(args, tokens):
+    limits = httpx.Limits(max_connections=args.users + 10, max_keepalive_connections=args.users + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=300, limits=limits) as client:
+        admin_token = None
+        if args.admin_email:
+            response = await client.post("/auth/login", json={"email": args.admin_email, "password": args.admin_password})
+            response.raise_for_status()
+            admin_token = response.json()["access_token"]
+
+        before = await statement_stats(client, admin_token)
+        for action in ("clock_in", "clock_out"):
+            latencies, errors = [], []
+            start = time.perf_counter()
+            await asyncio.gather(*(punch(client, token, action, latencies, errors) for token in tokens))
+            report(action, latencies, errors, time.perf_counter() - start)
+        after = await statement_stats(client, admin_token)
+
+    if after:
+        # Metrics are per worker; run the server with a single worker for exact numbers
+        before = before or {"calls": 0, "statements": 0, "commits": 0}
+        calls = after["calls"] - before["calls"]
+        if calls:
+            statements = (after["statements"] - before["statements"]) / calls
+            commits = (after["commits"] - before["commits"]) / calls
+            print(f"per punch: statements={statements:.2f} commits={commits:.2f} "
+                  f"round-trips={statements + commits:.2f} (over {calls} punches seen by this worker)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent clock-in/out benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--admin-email")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded tenant and its rows")
+    args = parser.parse_args()
+
+    print(f"Seeding {args.users} users...")
+    tenant_id, tokens = seed(args.users)
+    try:
+        asyncio.run(main(args, tokens))
+    finally:
+        if not args.keep:
+            cleanup(tenant_id)
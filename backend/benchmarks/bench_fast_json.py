@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Large list responses: per-row Pydantic models vs. the FAST_JSON row path.
+
+Builds --rows in-memory attendance logs, users (with two roles each) and
+leave requests, and serves each list through a FastAPI app two ways:
+
+* standard: ORM objects returned under ``response_model=List[...]``, so
+  FastAPI validates every row with ``from_attributes`` and encodes the result
+* fast: the same values as plain column tuples, encoded by
+  fast_json.rows_response / json_response (orjson)
+
+Requests go through the ASGI app in-process (no network, no database), so
+the timings are the serialization cost alone. Each pair of responses is
+checked to decode to the same JSON. Requires orjson.
+
+Usage:
+    python benchmarks/bench_fast_json.py --rows 10000 --repeat 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from fastapi import FastAPI
+
+from fast_json import json_response, response_fields, rows_response
+from models import AttendanceLog, LeaveRequest, Role, User
+from schemas import AttendanceLogResponse, LeaveRequestResponse, UserResponse
+
+
+def build_data(count):
+    tenant_id = uuid.uuid4()
+    start = datetime(2026, 1, 1, 9, tzinfo=timezone.utc)
+    roles = [Role(id=uuid.uuid4(), name=name, description=f"{name} role") for name in ("user", "manager")]
+    logs, users, leaves = [], [], []
+    for n in range(count):
+        user_id = uuid.uuid4()
+        logs.append(AttendanceLog(
+            id=uuid.uuid4(), tenant_id=tenant_id, user_id=user_id, attendance_id=uuid.uuid4(),
+            session_id=uuid.uuid4(), action="clock_in" if n % 2 == 0 else "clock_out",
+            timestamp=start + timedelta(minutes=n, microseconds=n), latitude=12.9716 + n * 1e-6,
+            longitude=77.5946, location_address="Bengaluru office", device_info="Android 14",
+            ip_address="10.0.0.1", shift_timing="09:00-18:00", shift_type="Regular", work_mode="Office",
+            policy_applied="Default shift", status="On Time", geofence_status="inside",
+            created_at=start + timedelta(minutes=n),
+        ))
+        user = User(
+            id=user_id, email=f"user{n}@example.com", username=f"user{n}", is_active=True,
+            created_at=start, name=f"User {n}", phone="+91 90000 00000", status="active",
+            department_id=uuid.uuid4(), timezone="Asia/Kolkata",
+        )
+        user.roles = roles
+        users.append(user)
+        leaves.append(LeaveRequest(
+            id=uuid.uuid4(), tenant_id=tenant_id, user_id=user_id, leave_type_id=uuid.uuid4(),
+            start_date=date(2026, 2, 1), end_date=date(2026, 2, 3), days_requested=3.0,
+            reason="Family trip", status="pending", created_at=start,
+        ))
+    return logs, users, leaves
+
+
+def as_rows(objects, fields):
+    return [tuple(getattr(obj, name) for name in fields) for obj in objects]
+
+
+def build_app(logs, users, leaves):
+    app = FastAPI()
+    log_fields = response_fields(AttendanceLogResponse)
+    leave_fields = response_fields(LeaveRequestResponse)
+    user_fields = response_fields(UserResponse)
+    log_rows = as_rows(logs, log_fields)
+    leave_rows = as_rows(leaves, leave_fields)
+    # What user_list_response builds from its two queries
+    user_records = [
+        {
+            **dict(zip(user_fields, (getattr(user, name) if name != "roles" else None for name in user_fields))),
+            "roles": [{"id": role.id, "name": role.name, "description": role.description} for role in user.roles],
+        }
+        for user in users
+    ]
+
+    @app.get("/standard/logs", response_model=List[AttendanceLogResponse])
+    def standard_logs():
+        return logs
+
+    @app.get("/fast/logs", response_model=List[AttendanceLogResponse])
+    def fast_logs():
+        return rows_response(log_rows, log_fields)
+
+    @app.get("/standard/users", response_model=List[UserResponse])
+    def standard_users():
+        return users
+
+    @app.get("/fast/users", response_model=List[UserResponse])
+    def fast_users():
+        return json_response(user_records)
+
+    @app.get("/standard/leaves", response_model=List[LeaveRequestResponse])
+    def standard_leaves():
+        return leaves
+
+    @app.get("/fast/leaves", response_model=List[LeaveRequestResponse])
+    def fast_leaves():
+        return rows_response(leave_rows, leave_fields)
+
+    return app
+
+
+async def run(args):
+    logs, users, leaves = build_data(args.rows)
+    app = build_app(logs, users, leaves)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for name in ("logs", "users", "leaves"):
+            timings, bodies = {}, {}
+            for path in ("standard", "fast"):
+                samples = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    response = await client.get(f"/{path}/{name}")
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[path] = samples
+                bodies[path] = response.content
+            same = json.loads(bodies["standard"]) == json.loads(bodies["fast"])
+            standard, fast = statistics.median(timings["standard"]), statistics.median(timings["fast"])
+            print(f"{name:<7} {args.rows} rows  standard={standard:8.1f}ms  fast={fast:7.1f}ms  "
+                  f"speedup={standard / fast:5.1f}x  {len(bodies['fast']) / 1024:7.0f}KB  "
+                  f"{'identical JSON' if same else 'JSON DIFFERS'}")
+            if not same:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Standard vs. FAST_JSON list responses")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Geofence check benchmark.
+
+Builds a tenant with --branches branches, each fenced by a --vertices-sided
+polygon plus a 150 m circle around its entrance, and times the status check
+clock-in runs: the gridded TenantFences lookup against a naive scan that
+tests every fence of the tenant. Runs fully in-process; no database is
+needed.
+
+Usage:
+    python benchmarks/bench_geofence.py --branches 500 --iterations 200000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from geofence import GEOFENCE_GRID_DEGREES, GEOFENCE_MAX_CELLS_PER_FENCE, TenantFences, parse_geo_fence
+
+
+def branch_fence(rng, vertices):
+    """A roughly 300 m polygon somewhere in a 50 km metro area, plus a circle"""
+    lat, lng = 12.97 + rng.uniform(-0.25, 0.25), 77.59 + rng.uniform(-0.25, 0.25)
+    ring = [
+        [lat + 0.0015 * math.cos(2 * math.pi * i / vertices), lng + 0.0015 * math.sin(2 * math.pi * i / vertices)]
+        for i in range(vertices)
+    ]
+    return json.dumps([ring, {"lat": lat, "lng": lng, "radius": 150}]), (lat, lng)
+
+
+def run(label, check, points, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        check(*points[i % len(points)])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {elapsed * 1e6 / iterations:8.2f} us/check")
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    fences, points = {}, []
+    start = time.perf_counter()
+    for _ in range(args.branches):
+        branch_id = uuid.uuid4()
+        raw, (lat, lng) = branch_fence(rng, args.vertices)
+        fences[branch_id] = parse_geo_fence(raw)
+        # Half the punches inside the branch, half a few hundred metres away
+        points.append((branch_id, lat + rng.uniform(-0.001, 0.001), lng + rng.uniform(-0.001, 0.001)))
+        points.append((branch_id, lat + rng.uniform(0.002, 0.004), lng + rng.uniform(0.002, 0.004)))
+    tenant = TenantFences(fences, None, GEOFENCE_GRID_DEGREES, GEOFENCE_MAX_CELLS_PER_FENCE)
+    print(f"{args.branches} branches x {args.vertices} vertices parsed and indexed in "
+          f"{(time.perf_counter() - start) * 1000:.1f}ms ({len(tenant.cells)} grid cells)")
+
+    all_shapes = [(branch_id, shape) for branch_id, shapes in fences.items() for shape in shapes]
+
+    def naive(branch_id, lat, lng):
+        return any(owner == branch_id and shape.contains(lat, lng) for owner, shape in all_shapes)
+
+    def gridded(branch_id, lat, lng):
+        return tenant.status(branch_id, lat, lng, GEOFENCE_GRID_DEGREES)
+
+    for branch_id, lat, lng in points:
+        assert naive(branch_id, lat, lng) == (gridded(branch_id, lat, lng) == "inside")
+
+    run("naive scan", naive, points, max(1, args.iterations // 100))
+    run("grid lookup", gridded, points, args.iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geofence check benchmark")
+    parser.add_argument("--branches", type=int, default=500)
+    parser.add_argument("--vertices", type=int, default=24)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
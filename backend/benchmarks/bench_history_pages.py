@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Personal attendance history: whole list vs. keyset pages vs. streaming.
+
+Seeds one user with --years of punches (four logs a day) into the database
+at DATABASE_URL and reads that history the way /attendance/my-logs used to
+(every row as an ORM object, then a Pydantic model each) and the two ways it
+does now: the first keyset page, and the whole history streamed from a
+server-side cursor. Reports time and peak Python memory for each. Everything
+runs in one transaction that is rolled back.
+
+Usage:
+    python benchmarks/bench_history_pages.py --years 5
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from database import engine
+from models import AttendanceLog
+from pagination import HISTORY_PAGE_SIZE, HISTORY_STREAM_BATCH, newest_first
+from schemas import AttendanceLogResponse
+
+SEED_SQL = [
+    """
+    INSERT INTO tenants (id, name, contact_email)
+    VALUES (:tenant_id, 'bench-history-' || :tag, 'bench-history@example.com')
+    """,
+    """
+    INSERT INTO users (id, email, username, hashed_password, is_active, tenant_id)
+    VALUES (:user_id, 'history-' || :tag || '@example.com', 'history-' || :tag, '!', true, :tenant_id)
+    """,
+    """
+    INSERT INTO attendance (id, tenant_id, user_id, date, total_work_hours, total_sessions, status)
+    SELECT gen_random_uuid(), :tenant_id, :user_id, current_date - d, 8, 2, 'Present'
+    FROM generate_series(0, :days - 1) d
+    """,
+    """
+    INSERT INTO attendance_logs (id, tenant_id, user_id, attendance_id, action, timestamp, status)
+    SELECT gen_random_uuid(), a.tenant_id, a.user_id, a.id,
+           CASE WHEN p % 2 = 1 THEN 'clock_in' ELSE 'clock_out' END,
+           a.date + make_interval(hours => 3 + p * 3), 'On Time'
+    FROM attendance a CROSS JOIN generate_series(1, 4) p
+    WHERE a.user_id = :user_id
+    """,
+]
+
+
+def measure(name, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count, size = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<22} rows={count:>7} bytes={size:>10} time={elapsed:9.1f}ms peak_mem={peak / 1024 / 1024:8.2f}MB")
+
+
+def main(args):
+    tag = uuid.uuid4().hex[:8]
+    params = {"tag": tag, "tenant_id": uuid.uuid4(), "user_id": uuid.uuid4(), "days": args.years * 365}
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            print(f"Seeding {params['days']} days x 4 logs for one user...")
+            for statement in SEED_SQL:
+                connection.execute(text(statement), params)
+            connection.execute(text("ANALYZE attendance_logs"))
+
+            def whole_list():
+                session = Session(bind=connection)
+                logs = session.query(AttendanceLog).filter(
+                    AttendanceLog.tenant_id == params["tenant_id"], AttendanceLog.user_id == params["user_id"]
+                ).order_by(AttendanceLog.timestamp.desc()).all()
+                body = "[" + ",".join(AttendanceLogResponse.model_validate(log).model_dump_json() for log in logs) + "]"
+                session.expunge_all()
+                return len(logs), len(body)
+
+            table = AttendanceLog.__table__
+            query = newest_first(
+                select(table).where(table.c.tenant_id == params["tenant_id"], table.c.user_id == params["user_id"]),
+                table.c.timestamp, table.c.id, None, None
+            )
+
+            def first_page():
+                rows = connection.execute(query.limit(HISTORY_PAGE_SIZE + 1)).all()[:HISTORY_PAGE_SIZE]
+                body = "[" + ",".join(AttendanceLogResponse.model_validate(dict(row._mapping)).model_dump_json() for row in rows) + "]"
+                return len(rows), len(body)
+
+            def streamed():
+                # Same loop as pagination.stream_json_list, minus its own session
+                result = connection.execute(query.execution_options(stream_results=True, yield_per=HISTORY_STREAM_BATCH))
+                count = size = 0
+                for row in result.mappings():
+                    size += len(AttendanceLogResponse.model_validate(dict(row)).model_dump_json()) + 1
+                    count += 1
+                return count, size + 1
+
+            measure("all() + models", whole_list)
+            measure(f"first page ({HISTORY_PAGE_SIZE})", first_page)
+            measure("streamed", streamed)
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Personal attendance history read modes")
+    parser.add_argument("--years", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Attendance log date-filter benchmark.
+
+Seeds --users users with a year of punches each (four logs a day) into the
+database at DATABASE_URL, then times the /attendance/my-logs filter for a
+single day, a week and a month two ways: the old ``date(timestamp)``
+comparison, which hides the column from its index, and the half-open UTC
+range from timeutils.between. Everything runs in one transaction that is
+rolled back, so the database is left as it was.
+
+Usage:
+    python benchmarks/bench_log_date_filter.py --users 200 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+
+from bench_clock_in_out import percentile
+from database import engine
+from models import AttendanceLog
+from timeutils import between
+
+SEED_SQL = [
+    """
+    INSERT INTO tenants (id, name, contact_email)
+    VALUES (:tenant_id, 'bench-logs-' || :tag, 'bench-logs@example.com')
+    """,
+    """
+    INSERT INTO users (id, email, username, hashed_password, is_active, tenant_id)
+    SELECT gen_random_uuid(), 'logs-' || :tag || '-' || n || '@example.com', 'logs-' || :tag || '-' || n, '!', true, :tenant_id
+    FROM generate_series(1, :users) n
+    """,
+    """
+    INSERT INTO attendance (id, tenant_id, user_id, date, total_work_hours, total_sessions, status)
+    SELECT gen_random_uuid(), u.tenant_id, u.id, current_date - d, 8, 2, 'Present'
+    FROM users u CROSS JOIN generate_series(0, :days - 1) d
+    WHERE u.tenant_id = :tenant_id
+    """,
+    # Two sessions a day, logged as four punches
+    """
+    INSERT INTO attendance_logs (id, tenant_id, user_id, attendance_id, action, timestamp, status)
+    SELECT gen_random_uuid(), a.tenant_id, a.user_id, a.id,
+           CASE WHEN p % 2 = 1 THEN 'clock_in' ELSE 'clock_out' END,
+           a.date + make_interval(hours => 3 + p * 3), 'On Time'
+    FROM attendance a CROSS JOIN generate_series(1, 4) p
+    WHERE a.tenant_id = :tenant_id
+    """,
+]
+
+
+def sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def old_filter(tenant_id, user_id, start, end):
+    return select(AttendanceLog).where(
+        AttendanceLog.tenant_id == tenant_id, AttendanceLog.user_id == user_id,
+        func.date(AttendanceLog.timestamp) >= start, func.date(AttendanceLog.timestamp) <= end
+    ).order_by(AttendanceLog.timestamp.desc())
+
+
+def new_filter(tenant_id, user_id, start, end, tz_name):
+    return select(AttendanceLog).where(
+        AttendanceLog.tenant_id == tenant_id, AttendanceLog.user_id == user_id,
+        *between(AttendanceLog.timestamp, start, end, tz_name)
+    ).order_by(AttendanceLog.timestamp.desc())
+
+
+def main(args):
+    tag = uuid.uuid4().hex[:8]
+    tenant_id = uuid.uuid4()
+    rng = random.Random(args.seed)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            print(f"Seeding {args.users} users x {args.days} days x 4 logs...")
+            params = {"tag": tag, "tenant_id": tenant_id, "users": args.users, "days": args.days}
+            for statement in SEED_SQL:
+                connection.execute(text(statement), params)
+            connection.execute(text("ANALYZE attendance_logs"))
+            user_ids = connection.execute(
+                text("SELECT id FROM users WHERE tenant_id = :tenant_id"), params
+            ).scalars().all()
+            user_ids = [uuid.UUID(str(user_id)) for user_id in user_ids]
+
+            for label, span in (("1 day", 1), ("7 days", 7), ("30 days", 30)):
+                cases = []
+                for _ in range(args.queries):
+                    end = date.today() - timedelta(days=rng.randrange(args.days - span + 1))
+                    cases.append((rng.choice(user_ids), end - timedelta(days=span - 1), end))
+                for name, build in (
+                    ("date(timestamp)", lambda u, s, e: old_filter(tenant_id, u, s, e)),
+                    ("UTC range", lambda u, s, e: new_filter(tenant_id, u, s, e, args.timezone)),
+                ):
+                    plan = "\n".join(connection.exec_driver_sql(f"EXPLAIN {sql(build(*cases[0]))}").scalars())
+                    timings = []
+                    for case in cases:
+                        statement = sql(build(*case))
+                        start = time.perf_counter()
+                        connection.exec_driver_sql(statement).fetchall()
+                        timings.append((time.perf_counter() - start) * 1000)
+                    # The old filter can only use the (tenant, user) prefix and re-checks every row
+                    ranged = any("Index Cond" in line and "timestamp" in line for line in plan.splitlines())
+                    scan = "timestamp range in index" if ranged else "timestamp filtered row by row"
+                    print(f"{label:<8} {name:<16} p50={percentile(timings, 50):7.2f}ms "
+                          f"p95={percentile(timings, 95):7.2f}ms mean={statistics.mean(timings):7.2f}ms ({scan})")
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Attendance log date-filter benchmark")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per filter and span")
+    parser.add_argument("--timezone", default="Asia/Kolkata", help="Timezone the requested days are in")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
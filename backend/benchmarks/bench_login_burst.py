@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Login burst benchmark.
+
+Fires a burst of concurrent /auth/login calls and, while the burst is in
+flight, keeps probing a cheap authenticated endpoint to show how much the
+login work delays everything else on the same server.
+
+Usage:
+    python benchmarks/bench_login_burst.py --email admin@example.com --password admin123
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, latencies, errors):
+    print(f"{name}: n={len(latencies)} errors={errors}")
+    if latencies:
+        print(
+            f"  p50={percentile(latencies, 50):.1f}ms "
+            f"p95={percentile(latencies, 95):.1f}ms "
+            f"p99={percentile(latencies, 99):.1f}ms "
+            f"max={max(latencies):.1f}ms mean={statistics.mean(latencies):.1f}ms"
+        )
+
+
+async def login_once(client, email, password, latencies, errors):
+    start = time.perf_counter()
+    try:
+        response = await client.post("/auth/login", json={"email": email, "password": password})
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            return
+    except httpx.HTTPError as e:
+        errors.append(str(e))
+        return
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def probe_loop(client, path, headers, interval, stop, latencies, errors):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+            else:
+                latencies.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+        await asyncio.sleep(interval)
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.logins + 10, max_keepalive_connections=args.logins + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        response = await client.post("/auth/login", json={"email": args.email, "password": args.password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        # Baseline latency of the probe with no login load
+        baseline, baseline_errors = [], []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_loop(client, args.probe_path, headers, args.probe_interval, stop, baseline, baseline_errors))
+        await asyncio.sleep(2)
+        stop.set()
+        await probe
+
+        login_latencies, login_errors = [], []
+        probe_latencies, probe_errors = [], []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_loop(client, args.probe_path, headers, args.probe_interval, stop, probe_latencies, probe_errors))
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            login_once(client, args.email, args.password, login_latencies, login_errors)
+            for _ in range(args.logins)
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    print(f"Burst of {args.logins} logins finished in {elapsed:.2f}s")
+    report("login", login_latencies, len(login_errors))
+    report(f"{args.probe_path} (idle)", baseline, len(baseline_errors))
+    report(f"{args.probe_path} (during burst)", probe_latencies, len(probe_errors))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login burst benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--probe-path", default="/user/profile")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
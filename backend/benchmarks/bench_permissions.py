@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Permission check benchmark.
+
+Compares the old list-scanning check (role names rebuilt per call, string
+permission looked up in per-role lists) against the compiled bitset matrix
+from permissions.py. Runs fully in-process; no database is needed.
+
+Usage:
+    python benchmarks/bench_permissions.py --iterations 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from auth import Principal
+from permissions import DEFAULT_ROLE_GRANTS, permission_engine, permission_key
+
+
+def legacy_check_permission(user, resource, action):
+    """The pre-matrix check_permission from auth.py"""
+    user_roles = [role.name for role in user.roles]
+
+    if "admin" in user_roles:
+        return True
+
+    permission_map = {
+        "manager": ["users:read", "dashboard:read", "reports:read"],
+        "user": ["profile:read", "profile:write"]
+    }
+
+    required_permission = f"{resource}:{action}"
+
+    for role in user_roles:
+        if role in permission_map and required_permission in permission_map[role]:
+            return True
+
+    return False
+
+
+def run(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1e9 / iterations:8.1f} ns/check")
+
+
+def main(args):
+    role_names = ("user", "manager")
+    legacy_user = SimpleNamespace(roles=[SimpleNamespace(name=name) for name in role_names])
+    principal = Principal(
+        id=uuid.uuid4(), tenant_id=uuid.uuid4(), email="", username="",
+        is_active=True, role_names=role_names,
+    )
+
+    # Same grants as the legacy map plus extra permissions to make the lists realistic
+    grants = [(role, key) for role, keys in DEFAULT_ROLE_GRANTS.items() for key in keys]
+    grants += [("manager", permission_key(f"resource{i}", "read")) for i in range(args.extra_permissions)]
+    compiled = permission_engine.compile_grants(grants)
+    bit = permission_engine.bit(permission_key("reports", "read"))
+
+    assert legacy_check_permission(legacy_user, "reports", "read")
+    assert compiled.mask_for(principal.role_names) & bit
+
+    print(f"{args.iterations} checks, {len(grants)} grants")
+    run("legacy list scan", lambda: legacy_check_permission(legacy_user, "reports", "read"), args.iterations)
+    run("compiled bitset", lambda: compiled.mask_for(principal.role_names) & bit, args.iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Permission check benchmark")
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    parser.add_argument("--extra-permissions", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Concurrent punches for one user: invariants and latency.
+
+Seeds a throwaway tenant (see bench_clock_in_out.py), fires --punches
+simultaneous /attendance/clock-in-out calls for a single user (a double tap
+or retry storm, multiplied), and then checks that user's day in the
+database:
+
+* sessions are numbered 1..N without gaps or duplicates
+* at most one session is open, and sessions do not overlap
+* total_sessions and total_work_hours match the sessions
+* every accepted punch left exactly one log row, one per clock-in session
+
+At the same time --bystanders other users of the same tenant punch once
+each, to show that serializing one user's punches does not hold up anyone
+else. Exits with status 1 if an invariant is broken.
+
+Usage:
+    python benchmarks/bench_punch_concurrency.py --punches 50 --bystanders 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import jwt
+from sqlalchemy import func, select
+
+from bench_clock_in_out import cleanup, report, seed
+from database import SessionLocal
+from models import Attendance, AttendanceLog, AttendanceSession
+
+
+async def punch(client, token, action, latencies, errors):
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            "/attendance/clock-in-out", json={"action": action},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            return None
+    except httpx.HTTPError as e:
+        errors.append(str(e))
+        return None
+    latencies.append((time.perf_counter() - start) * 1000)
+    return action
+
+
+def check_invariants(token, accepted, wait_seconds):
+    """Problems found in the hammered user's attendance; empty when consistent"""
+    user_id = jwt.decode(token, options={"verify_signature": False})["sub"]
+    db = SessionLocal()
+    try:
+        days = db.execute(select(Attendance).where(Attendance.user_id == user_id)).scalars().all()
+        problems = []
+        if len(days) != 1:
+            return [f"expected one attendance row for the user, found {len(days)}"]
+        day = days[0]
+        sessions = db.execute(
+            select(AttendanceSession).where(AttendanceSession.attendance_id == day.id)
+            .order_by(AttendanceSession.session_number)
+        ).scalars().all()
+
+        numbers = [session.session_number for session in sessions]
+        if numbers != list(range(1, len(sessions) + 1)):
+            problems.append(f"session numbers are not 1..{len(sessions)}: {numbers}")
+        open_sessions = [session for session in sessions if session.clock_out is None]
+        if len(open_sessions) > 1:
+            problems.append(f"{len(open_sessions)} sessions are open")
+        for earlier, later in zip(sessions, sessions[1:]):
+            if earlier.clock_out is None or earlier.clock_out > later.clock_in:
+                problems.append(f"session {earlier.session_number} overlaps session {later.session_number}")
+        if day.total_sessions != len(sessions):
+            problems.append(f"total_sessions={day.total_sessions} but {len(sessions)} sessions exist")
+        hours = sum(session.work_hours or 0.0 for session in sessions)
+        if abs((day.total_work_hours or 0.0) - hours) > 1e-6:
+            problems.append(f"total_work_hours={day.total_work_hours} but sessions sum to {hours}")
+        clock_ins = sum(1 for action in accepted if action == "clock_in")
+        if clock_ins != len(sessions):
+            problems.append(f"{clock_ins} clock-ins accepted but {len(sessions)} sessions exist")
+
+        # Write-behind mode commits log rows a little after the punch
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            logs = db.execute(
+                select(func.count()).select_from(AttendanceLog).where(AttendanceLog.attendance_id == day.id)
+            ).scalar()
+            db.rollback()
+            if logs >= len(accepted) or time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+        if logs != len(accepted):
+            problems.append(f"{len(accepted)} punches accepted but {logs} log rows written")
+        return problems
+    finally:
+        db.close()
+
+
+async def run(args, tokens):
+    target, bystanders = tokens[0], tokens[1:]
+    actions = [
+        "clock_in" if args.pattern == "clock_in" or i % 2 == 0 else "clock_out"
+        for i in range(args.punches)
+    ]
+    limits = httpx.Limits(max_connections=len(tokens) + args.punches, max_keepalive_connections=len(tokens) + args.punches)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        latencies, errors = [], []
+        bystander_latencies, bystander_errors = [], []
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(punch(client, target, action, latencies, errors) for action in actions),
+            *(punch(client, token, "clock_in", bystander_latencies, bystander_errors) for token in bystanders),
+        )
+        elapsed = time.perf_counter() - start
+
+    report(f"one user x {args.punches}", latencies, errors, elapsed)
+    if bystanders:
+        report(f"{len(bystanders)} bystanders", bystander_latencies, bystander_errors, elapsed)
+    accepted = [action for action in results[:args.punches] if action is not None]
+    return accepted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent punches for one user")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--punches", type=int, default=50)
+    parser.add_argument("--pattern", choices=["clock_in", "alternate"], default="clock_in",
+                        help="All clock-ins (double taps), or alternating clock-in/clock-out")
+    parser.add_argument("--bystanders", type=int, default=50, help="Other users in the tenant punching at the same time")
+    parser.add_argument("--log-wait", type=float, default=5.0, help="Seconds to wait for write-behind log rows")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded tenant and its rows")
+    args = parser.parse_args()
+
+    print(f"Seeding 1 + {args.bystanders} users...")
+    tenant_id, tokens = seed(1 + args.bystanders)
+    try:
+        accepted = asyncio.run(run(args, tokens))
+        problems = check_invariants(tokens[0], accepted, args.log_wait)
+    finally:
+        if not args.keep:
+            cleanup(tenant_id)
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print(f"✅ {len(accepted)} accepted punches left a consistent day")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Token renewal benchmark: /auth/refresh vs. logging in again.
+
+Without --base-url the script compares the CPU work of each path in-process
+(bcrypt verification + token signing vs. refresh-token hashing + token
+signing). With --base-url it times the real endpoints against a running
+server, rotating the refresh token on every call; raise the server's
+ADMISSION_ACCOUNT_RATE_PER_MINUTE / ADMISSION_ACCOUNT_BURST first, or the
+repeated logins are shed with 429.
+
+Usage:
+    python benchmarks/bench_token_renewal.py --iterations 50
+    python benchmarks/bench_token_renewal.py --base-url http://localhost:8000 \\
+        --email admin@example.com --password admin123
+"""
+
+import argparse
+import asyncio
+import os
+import secrets
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import bcrypt
+
+from auth import create_access_token, hash_token
+
+
+def summarize(name, samples_ms):
+    print(
+        f"{name:<10} n={len(samples_ms)} mean={statistics.mean(samples_ms):8.2f}ms "
+        f"p50={statistics.median(samples_ms):8.2f}ms max={max(samples_ms):8.2f}ms"
+    )
+
+
+def in_process(args):
+    hashed = bcrypt.hashpw(b"correct horse battery staple", bcrypt.gensalt())
+    claims = {"sub": str(uuid.uuid4()), "tenant_id": str(uuid.uuid4()), "roles": ["user"], "av": 0}
+
+    login, refresh = [], []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        bcrypt.checkpw(b"correct horse battery staple", hashed)
+        create_access_token(dict(claims))
+        login.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        hash_token(secrets.token_urlsafe(32))  # presented token lookup key
+        hash_token(secrets.token_urlsafe(32))  # successor token
+        create_access_token(dict(claims))
+        refresh.append((time.perf_counter() - start) * 1000)
+
+    print("In-process CPU cost per renewal (database round-trips excluded)")
+    summarize("re-login", login)
+    summarize("refresh", refresh)
+
+
+async def over_http(args):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        credentials = {"email": args.email, "password": args.password}
+        login, refresh = [], []
+        response = await client.post("/auth/login", json=credentials)
+        response.raise_for_status()
+        refresh_token = response.json()["refresh_token"]
+
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            response = await client.post("/auth/login", json=credentials)
+            response.raise_for_status()
+            login.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+            response.raise_for_status()
+            refresh_token = response.json()["refresh_token"]
+            refresh.append((time.perf_counter() - start) * 1000)
+
+    print(f"End-to-end latency against {args.base_url}")
+    summarize("re-login", login)
+    summarize("refresh", refresh)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh vs. re-login benchmark")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--base-url")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    if args.base_url:
+        asyncio.run(over_http(args))
+    else:
+        in_process(args)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Shift-start load generator: every employee clocks in within a few minutes.
+
+Provisions --tenants tenants with --users employees each entirely through the
+public API (/auth/signup-client, /admin/add-user, /auth/reset-password,
+/auth/login), then fires one /attendance/clock-in-out per employee following
+an arrival curve over --window seconds:
+
+    burst   everyone at t=0
+    ramp    arrivals spread evenly over the window
+    peak    normal curve centred on the window (the 08:55-09:05 shape)
+
+Reports p50/p95/p99 latency, errors by status, the peak arrival rate, and,
+from /admin/metrics (read with the first tenant owner's token), the pool
+checkout wait and statements per clock-in. Metrics are per worker: run the server with a single
+worker for exact numbers.
+
+Provisioning hashes one password per employee and is admission-limited per
+IP and per account; for large runs start the server with raised limits:
+    ADMISSION_IP_RATE_PER_MINUTE=100000 ADMISSION_IP_BURST=100000 python main.py
+
+Usage:
+    python benchmarks/loadgen_shift_start.py --tenants 5 --users 200 --curve peak --window 60
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from sqlalchemy import delete, select
+
+from bench_clock_in_out import percentile
+from database import SessionLocal
+from models import (
+    Attendance, AttendanceLog, AttendanceSession, AuditLog, AuthzVersion, Notification, Role, Tenant, User
+)
+
+PASSWORD = "Loadgen-Passw0rd!"
+
+
+async def call(client, method, url, retries=20, **kwargs):
+    """Send a provisioning request, waiting out 429/503 admission shedding"""
+    for _ in range(retries):
+        response = await client.request(method, url, **kwargs)
+        if response.status_code not in (429, 503):
+            response.raise_for_status()
+            return response.json()
+        await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+    response.raise_for_status()
+
+
+async def provision_tenant(client, tag, index, users, semaphore):
+    """Create one tenant through the API; returns (tenant name, owner token, employee tokens)"""
+    name = f"loadgen-{tag}-{index}"
+    owner = await call(client, "POST", "/auth/signup-client", json={
+        "tenant_name": name,
+        "tenant_contact_email": f"{name}@example.com",
+        "owner_email": f"owner-{name}@example.com",
+        "owner_username": f"owner-{name}",
+        "owner_password": PASSWORD,
+    })
+    owner_headers = {"Authorization": f"Bearer {owner['access_token']}"}
+    roles = await call(client, "GET", "/roles", headers=owner_headers)
+    role_id = next(role["id"] for role in roles if role["name"] == "user")
+
+    async def employee(n):
+        email = f"emp-{name}-{n}@example.com"
+        async with semaphore:
+            invite = await call(client, "POST", "/admin/add-user", headers=owner_headers, json={
+                "email": email, "username": f"emp-{name}-{n}", "role_id": role_id,
+            })
+            await call(client, "POST", "/auth/reset-password", json={
+                "token": invite["reset_token"], "new_password": PASSWORD,
+            })
+            login = await call(client, "POST", "/auth/login", json={"email": email, "password": PASSWORD})
+        return login["access_token"]
+
+    tokens = await asyncio.gather(*(employee(n) for n in range(users)))
+    return name, owner["access_token"], list(tokens)
+
+
+def arrival_offsets(count, curve, window, rng):
+    if curve == "burst" or window <= 0:
+        return [0.0] * count
+    if curve == "ramp":
+        return [window * i / max(1, count - 1) for i in range(count)]
+    # peak: normal curve with the window covering +/- 3 sigma
+    return [min(window, max(0.0, rng.gauss(window / 2, window / 6))) for _ in range(count)]
+
+
+async def metrics(client, owner_token):
+    response = await client.get("/admin/metrics", headers={"Authorization": f"Bearer {owner_token}"})
+    response.raise_for_status()
+    return response.json()
+
+
+async def punch(client, token, delay, start, latencies, errors):
+    await asyncio.sleep(max(0.0, start + delay - time.monotonic()))
+    sent = time.perf_counter()
+    try:
+        response = await client.post(
+            "/attendance/clock-in-out", json={"action": "clock_in"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - sent) * 1000)
+        else:
+            errors[response.status_code] += 1
+    except httpx.HTTPError as e:
+        errors[type(e).__name__] += 1
+
+
+def delta(after, before, *path):
+    for key in path:
+        after, before = after.get(key, {}), before.get(key, {})
+    return (after or 0) - (before or 0)
+
+
+async def run(args, tag):
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        print(f"🏗️  Provisioning {args.tenants} tenants x {args.users} users via the API...")
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(args.provision_concurrency)
+        tenants = await asyncio.gather(*(
+            provision_tenant(client, tag, i, args.users, semaphore) for i in range(args.tenants)
+        ))
+        print(f"   done in {time.monotonic() - started:.1f}s")
+
+        owner_token = tenants[0][1]
+        tokens = [token for _, _, employee_tokens in tenants for token in employee_tokens]
+        offsets = arrival_offsets(len(tokens), args.curve, args.window, rng)
+        rng.shuffle(offsets)
+        per_second = collections.Counter(int(offset) for offset in offsets)
+
+        before = await metrics(client, owner_token)
+        latencies, errors = [], collections.Counter()
+        print(f"🚀 Firing {len(tokens)} clock-ins ({args.curve} over {args.window:.0f}s)...")
+        start = time.monotonic()
+        await asyncio.gather(*(
+            punch(client, token, offset, start, latencies, errors) for token, offset in zip(tokens, offsets)
+        ))
+        elapsed = time.monotonic() - start
+        after = await metrics(client, owner_token)
+
+    print(f"clock-ins: n={len(latencies)} errors={sum(errors.values())} wall={elapsed:.2f}s "
+          f"peak arrivals={max(per_second.values())}/s")
+    if latencies:
+        print(
+            f"  p50={percentile(latencies, 50):.1f}ms "
+            f"p95={percentile(latencies, 95):.1f}ms "
+            f"p99={percentile(latencies, 99):.1f}ms "
+            f"max={max(latencies):.1f}ms mean={statistics.mean(latencies):.1f}ms"
+        )
+    if errors:
+        print(f"  errors by status: {dict(errors)}")
+
+    checkouts = delta(after, before, "db_pool", "checkouts")
+    wait_ms = delta(after, before, "db_pool", "wait_ms_total")
+    print(f"pool: {checkouts} checkouts, wait total={wait_ms:.1f}ms "
+          f"avg={wait_ms / checkouts if checkouts else 0:.2f}ms "
+          f"slow(>=10ms)={delta(after, before, 'db_pool', 'slow_checkouts')} "
+          f"worker max={after['db_pool']['wait_ms_max']:.1f}ms")
+    calls = delta(after, before, "statements", "clock_in_out", "calls")
+    if calls:
+        statements = delta(after, before, "statements", "clock_in_out", "statements")
+        commits = delta(after, before, "statements", "clock_in_out", "commits")
+        print(f"statements per clock-in: {statements / calls:.2f} (+{commits / calls:.2f} commits) over {calls} calls")
+
+
+def remove_tenants(tag):
+    """Delete every tenant this run provisioned; user-owned auth rows cascade from users"""
+    db = SessionLocal()
+    try:
+        tenant_ids = select(Tenant.id).where(Tenant.name.like(f"loadgen-{tag}-%")).scalar_subquery()
+        for model in (AttendanceLog, AttendanceSession, Attendance, AuditLog, Notification, AuthzVersion, User, Role):
+            db.execute(delete(model).where(model.tenant_id.in_(tenant_ids)), execution_options={"synchronize_session": False})
+        db.execute(delete(Tenant).where(Tenant.name.like(f"loadgen-{tag}-%")))
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shift-start clock-in load generator")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--tenants", type=int, default=5)
+    parser.add_argument("--users", type=int, default=200, help="Employees per tenant")
+    parser.add_argument("--curve", choices=["burst", "ramp", "peak"], default="peak")
+    parser.add_argument("--window", type=float, default=60.0, help="Seconds the arrivals are spread over")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the arrival curve")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--provision-concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--keep", action="store_true", help="Keep the provisioned tenants and their rows")
+    args = parser.parse_args()
+
+    tag = uuid.uuid4().hex[:8]
+    try:
+        asyncio.run(run(args, tag))
+    finally:
+        if not args.keep:
+            remove_tenants(tag)
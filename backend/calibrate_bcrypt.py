@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Measure bcrypt hashing time on this host and recommend a work factor.
+
+Run it on the deployment hardware (ideally under the same CPU limits as the
+API workers) and set BCRYPT_ROUNDS to the recommended cost. Existing hashes
+are moved to the new cost the next time each user logs in.
+
+Usage:
+    python calibrate_bcrypt.py --target-ms 250
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(__file__))
+
+import bcrypt
+
+from passwords import BCRYPT_ROUNDS
+
+
+def measure(cost, samples):
+    timings = []
+    salt = bcrypt.gensalt(rounds=cost)
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", salt)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms, samples, min_cost, max_cost):
+    print(f"⏱️  Measuring bcrypt on this host (target {target_ms:.0f}ms, {samples} samples per cost)")
+    recommended = None
+    for cost in range(min_cost, max_cost + 1):
+        median_ms = measure(cost, samples)
+        marker = ""
+        if median_ms <= target_ms:
+            recommended = cost
+            marker = "  ✓"
+        print(f"   cost {cost:2d}: {median_ms:9.1f}ms{marker}")
+        # Each step doubles the time; stop once we are well past the target
+        if median_ms > target_ms * 2:
+            break
+
+    print()
+    if recommended is None:
+        print(f"⚠️  Even cost {min_cost} exceeds {target_ms:.0f}ms on this host; use BCRYPT_ROUNDS={min_cost} "
+              f"and add hashing workers instead.")
+        return min_cost
+    print(f"✅ Recommended: BCRYPT_ROUNDS={recommended} (currently configured: {BCRYPT_ROUNDS})")
+    return recommended
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recommend a bcrypt work factor for a target latency")
+    parser.add_argument("--target-ms", type=float, default=250.0,
+                        help="Time budget for a single hash/verify in milliseconds")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--min-cost", type=int, default=10)
+    parser.add_argument("--max-cost", type=int, default=16)
+    args = parser.parse_args()
+    calibrate(args.target_ms, args.samples, args.min_cost, args.max_cost)
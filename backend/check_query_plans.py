@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for the attendance hot paths.
+
+Seeds realistic volumes (tenants x users x days of attendance, sessions and
+logs) into the database at DATABASE_URL, runs ANALYZE, and captures EXPLAIN
+for each hot query, built by the same helpers main.py and the presence index
+call (attendance_queries, presence, attendance_detail). Exits with status 1 if any of them
+plans a sequential scan on an attendance table. Everything runs in one
+transaction that is rolled back, so the database is left as it was.
+
+Run against a local Postgres migrated to head (alembic upgrade head):
+    python check_query_plans.py --tenants 10 --users 200 --days 60
+"""
+
+import argparse
+import json
+import sys
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import select, text
+
+from attendance_detail import day_detail_query, range_detail_query
+from attendance_queries import close_open_session, my_logs_query, my_records_query, upsert_day
+from database import engine
+from models import AttendanceLog
+from pagination import HISTORY_PAGE_SIZE, encode_cursor
+from presence import open_sessions_query, user_presence_query
+
+HOT_TABLES = {"attendance", "attendance_sessions", "attendance_logs"}
+
+SEED_SQL = [
+    """
+    INSERT INTO tenants (id, name, contact_email)
+    SELECT gen_random_uuid(), 'plan-check-' || :tag || '-' || t, 'plan-check@example.com'
+    FROM generate_series(1, :tenants) t
+    """,
+    """
+    INSERT INTO users (id, email, username, hashed_password, is_active, tenant_id)
+    SELECT gen_random_uuid(), 'plan-' || :tag || '-' || t.name || '-' || n || '@example.com',
+           'plan-' || :tag || '-' || t.name || '-' || n, '!', true, t.id
+    FROM tenants t CROSS JOIN generate_series(1, :users) n
+    WHERE t.name LIKE 'plan-check-' || :tag || '-%'
+    """,
+    """
+    INSERT INTO attendance (id, tenant_id, user_id, date, total_work_hours, total_sessions, status)
+    SELECT gen_random_uuid(), u.tenant_id, u.id, current_date - d, 8, 2, 'Present'
+    FROM users u CROSS JOIN generate_series(0, :days - 1) d
+    WHERE u.email LIKE 'plan-' || :tag || '-%'
+    """,
+    # Two sessions a day; today's second one is still open
+    """
+    INSERT INTO attendance_sessions (id, tenant_id, user_id, attendance_id, session_number, clock_in, clock_out, work_hours, status)
+    SELECT gen_random_uuid(), a.tenant_id, a.user_id, a.id, s,
+           a.date + make_interval(hours => 4 + s * 5),
+           CASE WHEN a.date = current_date AND s = 2 THEN NULL ELSE a.date + make_interval(hours => 8 + s * 5) END,
+           4, 'Completed'
+    FROM attendance a CROSS JOIN generate_series(1, 2) s
+    JOIN tenants t ON t.id = a.tenant_id
+    WHERE t.name LIKE 'plan-check-' || :tag || '-%'
+    """,
+    """
+    INSERT INTO attendance_logs (id, tenant_id, user_id, attendance_id, session_id, action, timestamp, status, idempotency_key)
+    SELECT gen_random_uuid(), s.tenant_id, s.user_id, s.attendance_id, s.id, e.action,
+           CASE WHEN e.action = 'clock_in' THEN s.clock_in ELSE s.clock_out END, 'On Time',
+           CASE WHEN e.action = 'clock_in' THEN s.id::text || '-in' END
+    FROM attendance_sessions s
+    JOIN tenants t ON t.id = s.tenant_id
+    CROSS JOIN (VALUES ('clock_in'), ('clock_out')) e(action)
+    WHERE t.name LIKE 'plan-check-' || :tag || '-%'
+      AND (e.action = 'clock_in' OR s.clock_out IS NOT NULL)
+    """,
+]
+
+
+def hot_queries(tenant_id, user_id, attendance_id, today):
+    """The attendance statements main.py sends per request, built by the same helpers, for one seeded user"""
+    now = datetime.now(timezone.utc)
+    week_ago = today - timedelta(days=7)
+    # A page past the first: the keyset predicate must stay on the index too
+    cursor = encode_cursor(now - timedelta(days=3), uuid.uuid4())
+    size = HISTORY_PAGE_SIZE + 1
+    return {
+        "clock-in-out: upsert day row": upsert_day(uuid.uuid4(), tenant_id, user_id, today, 1),
+        "clock-in-out: close open session": close_open_session(attendance_id, now),
+        "current-session: presence fallback": user_presence_query(tenant_id, user_id, today),
+        "presence: rebuild open sessions": open_sessions_query(),
+        "presence: tenant roster fallback": open_sessions_query(tenant_id),
+        "my-records: date range page": my_records_query(tenant_id, user_id, week_ago, today, None).limit(size),
+        "my-logs: first page": my_logs_query(tenant_id, user_id, None, None, "Asia/Kolkata", None).limit(size),
+        "my-logs: next page": my_logs_query(tenant_id, user_id, None, None, "Asia/Kolkata", cursor).limit(size),
+        "my-logs: date range page": my_logs_query(
+            tenant_id, user_id, week_ago, today, "Asia/Kolkata", cursor
+        ).limit(size),
+        "my-detail: day as JSON": day_detail_query(tenant_id, user_id, today),
+        "my-detail: month as JSON": range_detail_query(tenant_id, user_id, today.replace(day=1), today),
+        "clock-events batch: recorded keys": select(AttendanceLog.idempotency_key).where(
+            AttendanceLog.tenant_id == tenant_id, AttendanceLog.user_id == user_id,
+            AttendanceLog.idempotency_key.in_([f"{uuid.uuid4()}-in" for _ in range(50)])
+        ),
+    }
+
+
+def seq_scans(plan):
+    """Relations read by a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan tree"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in HOT_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def check(tenants, users, days, verbose):
+    tag = uuid.uuid4().hex[:8]
+    failures = []
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            print(f"🌱 Seeding {tenants} tenants x {users} users x {days} days...")
+            params = {"tag": tag, "tenants": tenants, "users": users, "days": days}
+            for statement in SEED_SQL:
+                connection.execute(text(statement), params)
+            for table in ("tenants", "users", *sorted(HOT_TABLES)):
+                connection.execute(text(f"ANALYZE {table}"))
+
+            sample = connection.execute(text("""
+                SELECT a.tenant_id, a.user_id, a.id, a.date FROM attendance a
+                JOIN tenants t ON t.id = a.tenant_id
+                WHERE t.name LIKE 'plan-check-' || :tag || '-%' AND a.date = current_date
+                LIMIT 1
+            """), {"tag": tag}).one()
+
+            print("🔎 Checking query plans...")
+            tenant_id, user_id, attendance_id, today = sample
+            queries = hot_queries(uuid.UUID(str(tenant_id)), uuid.UUID(str(user_id)), uuid.UUID(str(attendance_id)), today)
+            for name, statement in queries.items():
+                compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+                # ON CONFLICT ... SET keeps its binds even with literal_binds; pass them along
+                sql, params = str(compiled), compiled.params
+                plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scans = seq_scans(plan[0]["Plan"])
+                print(f"   {'❌' if scans else '✅'} {name}" + (f" (Seq Scan on {', '.join(scans)})" if scans else ""))
+                if scans:
+                    failures.append(name)
+                if verbose or scans:
+                    for line in connection.exec_driver_sql(f"EXPLAIN {sql}", params).scalars():
+                        print(f"        {line}")
+        finally:
+            transaction.rollback()
+
+    if failures:
+        print(f"❌ {len(failures)} hot queries fall back to a sequential scan")
+    else:
+        print("✅ All hot queries use indexes")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if an attendance hot query plans a sequential scan")
+    parser.add_argument("--tenants", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200, help="Users per tenant")
+    parser.add_argument("--days", type=int, default=60, help="Days of attendance per user")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args()
+    sys.exit(0 if check(args.tenants, args.users, args.days, args.verbose) else 1)
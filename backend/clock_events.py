@@ -0,0 +1,256 @@
+# clock_events.py
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from auth import Principal
+from models import Attendance, AttendanceLog, AttendanceSession
+from schemas import ClockEvent
+from shift_policies import shift_policy_cache
+from geofence import geofence_cache
+from presence import Presence, presence_index
+from timeutils import local_date, zone
+
+# Batch limits for offline punch uploads
+CLOCK_BATCH_MAX_EVENTS = int(os.getenv("CLOCK_BATCH_MAX_EVENTS", "10000"))
+CLOCK_BATCH_MAX_AGE_DAYS = int(os.getenv("CLOCK_BATCH_MAX_AGE_DAYS", "7"))
+# Device clocks run ahead; tolerate this much before calling a punch "in the future"
+CLOCK_BATCH_MAX_SKEW_SECONDS = int(os.getenv("CLOCK_BATCH_MAX_SKEW_SECONDS", "300"))
+
+CLOCK_ACTIONS = ("clock_in", "clock_out")
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def validate_clock_events(events: List[ClockEvent], now: datetime):
+    """Split a batch into time-ordered valid events, rejections and in-batch duplicates"""
+    oldest = now - timedelta(days=CLOCK_BATCH_MAX_AGE_DAYS)
+    newest = now + timedelta(seconds=CLOCK_BATCH_MAX_SKEW_SECONDS)
+    valid, rejected, seen = [], [], set()
+    duplicates = 0
+    for event in events:
+        if event.idempotency_key in seen:
+            duplicates += 1
+            continue
+        seen.add(event.idempotency_key)
+        timestamp = _as_utc(event.timestamp)
+        if event.action not in CLOCK_ACTIONS:
+            rejected.append({"idempotency_key": event.idempotency_key, "reason": f"Unknown action '{event.action}'"})
+        elif timestamp < oldest:
+            rejected.append({"idempotency_key": event.idempotency_key, "reason": f"Older than {CLOCK_BATCH_MAX_AGE_DAYS} days"})
+        elif timestamp > newest:
+            rejected.append({"idempotency_key": event.idempotency_key, "reason": "Timestamp is in the future"})
+        else:
+            valid.append((timestamp, event))
+    # Stable sort: punches with the same timestamp keep their upload order
+    valid.sort(key=lambda item: item[0])
+    return valid, rejected, duplicates
+
+
+class _Day:
+    """Session state of one attendance row while a batch is paired"""
+
+    __slots__ = (
+        "attendance_id", "total_sessions", "total_work_hours", "status", "revision", "open_sessions", "last_punch", "changed"
+    )
+
+    def __init__(self, attendance_id, total_sessions, total_work_hours, status, revision, open_sessions, last_punch):
+        self.attendance_id = attendance_id
+        self.total_sessions = total_sessions or 0
+        self.total_work_hours = total_work_hours or 0.0
+        self.status = status
+        self.revision = revision
+        # dicts of sessions without a clock-out; existing rows carry "existing": True
+        self.open_sessions: List[dict] = open_sessions
+        # Latest clock-in or clock-out already on the day; a punch must come after it
+        self.last_punch: Optional[datetime] = last_punch
+        self.changed = False
+
+
+def ingest_clock_events(db: Session, principal: Principal, events: List[ClockEvent], ip_address: Optional[str] = None) -> dict:
+    """Pair a batch of device-timestamped punches into sessions and write them in one transaction.
+
+    Pairing follows the live clock-in/out rules per local day of the
+    user's timezone: a clock-in
+    closes any open session and opens the next one, a clock-out closes the
+    open session. Every write is a bulk statement, so the number of
+    round-trips does not depend on the batch size. Events whose idempotency
+    key was already recorded are counted as duplicates and skipped; events at
+    or before the day's last recorded punch are rejected.
+    """
+    now = datetime.now(timezone.utc)
+    valid, rejected, duplicates = validate_clock_events(events, now)
+    if not valid:
+        return {"accepted": 0, "duplicates": duplicates, "rejected": rejected}
+
+    # Get or create an attendance row for every day in the batch. The upsert also
+    # locks the rows (in date order), so a re-sent batch waits for this one.
+    dates = sorted({local_date(timestamp, principal.timezone) for timestamp, _ in valid})
+    day_rows = db.execute(
+        pg_insert(Attendance)
+        .values([
+            {
+                "id": uuid.uuid4(),
+                "tenant_id": principal.tenant_id,
+                "user_id": principal.id,
+                "date": day,
+                "status": "Present",
+                "total_work_hours": 0.0,
+                "total_sessions": 0,
+            }
+            for day in dates
+        ])
+        .on_conflict_do_update(
+            index_elements=[Attendance.tenant_id, Attendance.user_id, Attendance.date],
+            set_={"total_sessions": Attendance.total_sessions},
+        )
+        .returning(
+            Attendance.id, Attendance.date, Attendance.total_sessions, Attendance.total_work_hours, Attendance.status,
+            Attendance.revision
+        )
+    ).all()
+
+    recorded = set(db.execute(
+        select(AttendanceLog.idempotency_key).where(
+            AttendanceLog.tenant_id == principal.tenant_id,
+            AttendanceLog.user_id == principal.id,
+            AttendanceLog.idempotency_key.in_([event.idempotency_key for _, event in valid])
+        )
+    ).scalars())
+    if recorded:
+        duplicates += sum(1 for _, event in valid if event.idempotency_key in recorded)
+        valid = [(timestamp, event) for timestamp, event in valid if event.idempotency_key not in recorded]
+    if not valid:
+        db.commit()
+        return {"accepted": 0, "duplicates": duplicates, "rejected": rejected}
+
+    # Every session of the batch's days: the open ones to pair with, and the last recorded punch
+    session_rows = db.execute(
+        select(
+            AttendanceSession.id, AttendanceSession.attendance_id, AttendanceSession.clock_in, AttendanceSession.clock_out
+        ).where(
+            AttendanceSession.attendance_id.in_([row.id for row in day_rows])
+        ).order_by(AttendanceSession.clock_in)
+    ).all()
+    days: Dict[object, _Day] = {}
+    for row in day_rows:
+        sessions = [session for session in session_rows if session.attendance_id == row.id]
+        days[row.date] = _Day(row.id, row.total_sessions, row.total_work_hours, row.status, row.revision, [
+            {"id": session.id, "clock_in": session.clock_in, "existing": True}
+            for session in sessions if session.clock_out is None
+        ], max((session.clock_out or session.clock_in for session in sessions), default=None))
+
+    shift = shift_policy_cache.shift_for(db, principal)
+    # Offline punches are recorded with their fence result but never rejected for it
+    fences = geofence_cache.tenant(db, principal.tenant_id)
+    session_updates, new_sessions, log_rows = [], [], []
+    for timestamp, event in valid:
+        day = days[local_date(timestamp, principal.timezone)]
+        # A backdated punch would overlap sessions already recorded (and count their hours twice)
+        if day.last_punch is not None and timestamp <= day.last_punch:
+            rejected.append({"idempotency_key": event.idempotency_key, "reason": "At or before the last recorded punch of the day"})
+            continue
+        day.last_punch = timestamp
+
+        session_id = None
+        # Both actions close whatever is open; clock-in then opens the next session
+        for session in day.open_sessions:
+            work_hours = (timestamp - session["clock_in"]).total_seconds() / 3600
+            day.total_work_hours += work_hours
+            closed = {"clock_out": timestamp, "work_hours": work_hours, "status": "Completed"}
+            if session.get("existing"):
+                session_updates.append({"id": session["id"], **closed})
+            else:
+                session.update(closed)
+            session_id = session["id"]
+        day.open_sessions = []
+
+        status = "On Time"
+        if event.action == "clock_in":
+            day.total_sessions += 1
+            session = {
+                "id": uuid.uuid4(),
+                "tenant_id": principal.tenant_id,
+                "user_id": principal.id,
+                "attendance_id": day.attendance_id,
+                "session_number": day.total_sessions,
+                "clock_in": timestamp,
+                "clock_out": None,
+                "work_hours": 0.0,
+                "status": "Active",
+            }
+            new_sessions.append(session)
+            day.open_sessions = [session]
+            session_id = session["id"]
+            if shift is not None:
+                status = shift.clock_in_status(timestamp.astimezone(zone(principal.timezone)))
+        day.changed = True
+
+        log_rows.append({
+            "id": uuid.uuid4(),
+            "tenant_id": principal.tenant_id,
+            "user_id": principal.id,
+            "attendance_id": day.attendance_id,
+            "session_id": session_id,
+            "action": event.action,
+            "timestamp": timestamp,
+            "latitude": event.latitude,
+            "longitude": event.longitude,
+            "location_address": event.location_address,
+            "device_info": event.device_info,
+            "ip_address": ip_address,
+            "shift_timing": shift.shift_timing if shift else None,
+            "shift_type": shift.shift_type if shift else None,
+            "work_mode": shift.work_mode if shift else None,
+            "policy_applied": shift.policy_name if shift else None,
+            "status": status,
+            "geofence_status": geofence_cache.status(fences, principal.branch_id, event.latitude, event.longitude),
+            "idempotency_key": event.idempotency_key,
+        })
+
+    if session_updates:
+        db.execute(update(AttendanceSession), session_updates)
+    if new_sessions:
+        db.execute(insert(AttendanceSession), new_sessions)
+    if log_rows:
+        db.execute(insert(AttendanceLog), log_rows)
+    day_updates = [
+        {"id": day.attendance_id, "total_sessions": day.total_sessions, "total_work_hours": day.total_work_hours,
+         "revision": day.revision + 1, "updated_at": now}
+        for day in days.values() if day.changed
+    ]
+    if day_updates:
+        db.execute(update(Attendance), day_updates)
+    # Presence tracks the latest day; the index ignores it if a newer day is already known
+    presence = None
+    if day_updates:
+        latest = max(day for day, state in days.items() if state.changed)
+        state = days[latest]
+        open_session = state.open_sessions[-1] if state.open_sessions else None
+        presence = Presence(
+            tenant_id=str(principal.tenant_id),
+            user_id=str(principal.id),
+            date=latest,
+            attendance_id=str(state.attendance_id),
+            session_number=open_session["session_number"] if open_session else None,
+            clock_in=open_session["clock_in"] if open_session else None,
+            total_sessions=state.total_sessions,
+            total_work_hours=state.total_work_hours,
+            status=state.status,
+            timezone=principal.timezone,
+            revision=state.revision + 1,
+        )
+        presence_index.publish(db, presence)
+    db.commit()
+    if presence is not None:
+        presence_index.apply(presence)
+    return {"accepted": len(log_rows), "duplicates": duplicates, "rejected": rejected}
@@ -0,0 +1,81 @@
+# etags.py
+"""Conditional GET (ETag / If-None-Match) for reads that rarely change.
+
+A handler computes a cheap validator for what it is about to return (for
+example the row count and latest change time of the tenant's rows, see
+``table_version``) and calls ``conditional_gets.check`` before loading any
+rows. If the client already holds that version it gets a bodiless 304 and
+the rows are never fetched or serialized.
+"""
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+# Clients may keep the body but must revalidate it before every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def table_version(db: Session, model, *filters) -> tuple:
+    """(row count, latest created/updated time) of ``model`` rows matching ``filters``"""
+    changed = func.coalesce(model.updated_at, model.created_at)
+    return tuple(db.execute(select(func.count(), func.max(changed)).select_from(model).where(*filters)).one())
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same version
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == wanted:
+            return True
+    return False
+
+
+class ConditionalGets:
+    """Builds ETags, answers If-None-Match, and counts 304s per route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # route -> [requests checked, 304s served]
+        self._routes: Dict[str, List[int]] = {}
+
+    @staticmethod
+    def etag(*parts) -> str:
+        return 'W/"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:20] + '"'
+
+    def check(self, request: Request, response: Response, route: str, *parts) -> Optional[Response]:
+        """A 304 to return as-is if the client's copy is current; otherwise tags ``response`` and returns None"""
+        etag = self.etag(route, *parts)
+        not_modified = _matches(request.headers.get("if-none-match"), etag)
+        with self._lock:
+            counts = self._routes.setdefault(route, [0, 0])
+            counts[0] += 1
+            if not_modified:
+                counts[1] += 1
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if not_modified:
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    "requests": checked,
+                    "not_modified": not_modified,
+                    "not_modified_rate": round(not_modified / checked, 4) if checked else 0.0,
+                }
+                for route, (checked, not_modified) in self._routes.items()
+            }
+
+
+conditional_gets = ConditionalGets()
@@ -0,0 +1,50 @@
+# fast_json.py
+"""Opt-in fast path for large list responses.
+
+The default path loads ORM objects, validates each one into its Pydantic
+response model (``from_attributes``) and lets FastAPI encode the result.
+With FAST_JSON=true, list endpoints select only the response model's columns
+as plain rows and encode them with orjson in one call. The JSON is the same:
+the same keys in the same order, and datetimes written the way Pydantic
+writes them (UTC as ``Z``).
+"""
+import os
+from typing import Iterable, Optional, Sequence, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional dependency; the standard path is used without it
+    orjson = None
+
+# Encode big list responses from plain rows with orjson instead of per-row models
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() == "true"
+
+if FAST_JSON and orjson is None:
+    print("[WARN] FAST_JSON is set but orjson is not installed; using the standard response path.")
+    FAST_JSON = False
+
+
+def response_fields(model: Type[BaseModel]) -> list:
+    """Field names of a response model, in the order Pydantic serializes them"""
+    return list(model.model_fields)
+
+
+def response_columns(table, model: Type[BaseModel], skip: Sequence[str] = ()) -> list:
+    """``table``'s columns for each field of ``model`` (fields in ``skip`` are left out)"""
+    return [table.c[name] for name in model.model_fields if name not in skip]
+
+
+def json_response(content, headers: Optional[dict] = None) -> Response:
+    return Response(
+        content=orjson.dumps(content, option=orjson.OPT_UTC_Z),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def rows_response(rows: Iterable[Sequence], fields: Sequence[str], headers: Optional[dict] = None) -> Response:
+    """JSON list of objects from rows whose values are in ``fields`` order"""
+    return json_response([dict(zip(fields, row)) for row in rows], headers)
@@ -0,0 +1,288 @@
+# geofence.py
+"""Branch geofences parsed once per tenant and indexed in a coarse grid.
+
+``Branch.geo_fence`` holds JSON in one of these shapes:
+
+* GeoJSON ``Polygon`` / ``MultiPolygon`` geometry, ``Feature`` or
+  ``FeatureCollection`` (coordinates are ``[longitude, latitude]``; a
+  ``Point`` feature with a ``radius`` property is a circle)
+* a circle: ``{"lat": .., "lng": .., "radius": metres}`` or
+  ``{"center": [lat, lng], "radius": metres}``
+* a polygon as a list of points: ``[[lat, lng], ...]`` or
+  ``[{"lat": .., "lng": ..}, ...]``
+* a list of circles and/or polygons in the forms above
+"""
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from auth import Principal
+from models import Branch
+
+# Reject clock-ins outside the user's branch fences instead of only recording them
+GEOFENCE_ENFORCE = os.getenv("GEOFENCE_ENFORCE", "false").lower() == "true"
+# How often a worker re-checks a tenant's branches for changes made elsewhere
+GEOFENCE_RECHECK_SECONDS = float(os.getenv("GEOFENCE_RECHECK_SECONDS", "30"))
+# Grid cell edge in degrees (0.01 is about 1.1 km of latitude)
+GEOFENCE_GRID_DEGREES = float(os.getenv("GEOFENCE_GRID_DEGREES", "0.01"))
+# Fences spanning more cells than this are checked on every lookup instead
+GEOFENCE_MAX_CELLS_PER_FENCE = int(os.getenv("GEOFENCE_MAX_CELLS_PER_FENCE", "2500"))
+
+INSIDE = "inside"
+OUTSIDE = "outside"
+NO_LOCATION = "no_location"
+
+EARTH_RADIUS_M = 6371008.8
+
+
+class Circle:
+    __slots__ = ("lat", "lng", "radius", "bbox")
+
+    def __init__(self, lat: float, lng: float, radius: float):
+        if radius <= 0:
+            raise ValueError("radius must be positive")
+        self.lat, self.lng, self.radius = lat, lng, radius
+        dlat = math.degrees(radius / EARTH_RADIUS_M)
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        self.bbox = (lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+
+    def contains(self, lat: float, lng: float) -> bool:
+        phi1, phi2 = math.radians(self.lat), math.radians(lat)
+        dphi = phi2 - phi1
+        dlmb = math.radians(lng - self.lng)
+        a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+        return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a))) <= self.radius
+
+
+class Polygon:
+    """Outer ring with optional holes, as (lat, lng) vertices"""
+
+    __slots__ = ("rings", "bbox")
+
+    def __init__(self, rings: List[List[Tuple[float, float]]]):
+        rings = [ring[:-1] if len(ring) > 1 and ring[0] == ring[-1] else ring for ring in rings]
+        if not rings or len(rings[0]) < 3:
+            raise ValueError("a polygon needs at least three points")
+        self.rings = rings
+        lats = [lat for lat, _ in rings[0]]
+        lngs = [lng for _, lng in rings[0]]
+        self.bbox = (min(lats), min(lngs), max(lats), max(lngs))
+
+    @staticmethod
+    def _in_ring(ring, lat: float, lng: float) -> bool:
+        inside = False
+        j = len(ring) - 1
+        for i in range(len(ring)):
+            lat_i, lng_i = ring[i]
+            lat_j, lng_j = ring[j]
+            if (lat_i > lat) != (lat_j > lat):
+                if lng < (lng_j - lng_i) * (lat - lat_i) / (lat_j - lat_i) + lng_i:
+                    inside = not inside
+            j = i
+        return inside
+
+    def contains(self, lat: float, lng: float) -> bool:
+        if not self._in_ring(self.rings[0], lat, lng):
+            return False
+        return not any(self._in_ring(hole, lat, lng) for hole in self.rings[1:])
+
+
+def _point(value) -> Tuple[float, float]:
+    """(lat, lng) from [lat, lng] or {"lat", "lng"/"lon"/"longitude"}"""
+    if isinstance(value, dict):
+        lat = value.get("lat", value.get("latitude"))
+        lng = value.get("lng", value.get("lon", value.get("longitude")))
+        return float(lat), float(lng)
+    lat, lng = value[:2]
+    return float(lat), float(lng)
+
+
+def _geojson_ring(ring) -> List[Tuple[float, float]]:
+    return [(float(lat), float(lng)) for lng, lat, *_ in ring]
+
+
+def _is_point(value) -> bool:
+    if isinstance(value, dict):
+        return "type" not in value and "radius" not in value and "radius_m" not in value
+    return isinstance(value, list) and len(value) >= 2 and all(isinstance(v, (int, float)) for v in value[:2])
+
+
+def _parse(value) -> list:
+    if isinstance(value, list):
+        if not value:
+            return []
+        if _is_point(value[0]):
+            return [Polygon([[_point(point) for point in value]])]
+        # A list of fences
+        return [shape for item in value for shape in _parse(item)]
+    if not isinstance(value, dict):
+        raise ValueError(f"unsupported geofence value {type(value).__name__}")
+
+    kind = value.get("type")
+    if kind == "FeatureCollection":
+        return [shape for feature in value.get("features", []) for shape in _parse(feature)]
+    if kind == "Feature":
+        geometry = dict(value.get("geometry") or {})
+        radius = (value.get("properties") or {}).get("radius")
+        if geometry.get("type") == "Point" and radius is not None:
+            lng, lat = geometry["coordinates"][:2]
+            return [Circle(float(lat), float(lng), float(radius))]
+        return _parse(geometry)
+    if kind == "Polygon":
+        return [Polygon([_geojson_ring(ring) for ring in value["coordinates"]])]
+    if kind == "MultiPolygon":
+        return [Polygon([_geojson_ring(ring) for ring in polygon]) for polygon in value["coordinates"]]
+    if "radius" in value or "radius_m" in value:
+        radius = float(value.get("radius", value.get("radius_m")))
+        center = value.get("center", value)
+        lat, lng = _point(center)
+        return [Circle(lat, lng, radius)]
+    raise ValueError(f"unsupported geofence type {kind!r}")
+
+
+def parse_geo_fence(raw: Optional[str]) -> list:
+    """Shapes described by a Branch.geo_fence string; raises ValueError if it cannot be read"""
+    if raw is None or not raw.strip():
+        return []
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"geofence is not valid JSON: {e}")
+    try:
+        return _parse(value)
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"malformed geofence: {e!r}")
+
+
+class TenantFences:
+    """All branch fences of one tenant, bucketed by grid cell"""
+
+    __slots__ = ("cells", "oversized", "branches", "fingerprint", "checked_at")
+
+    def __init__(self, fences: Dict[object, list], fingerprint, cell_degrees: float, max_cells: int):
+        self.cells: Dict[Tuple[int, int], List[tuple]] = {}
+        self.oversized: List[tuple] = []
+        self.branches = frozenset(branch_id for branch_id, shapes in fences.items() if shapes)
+        self.fingerprint = fingerprint
+        self.checked_at = time.monotonic()
+        for branch_id, shapes in fences.items():
+            for shape in shapes:
+                min_lat, min_lng, max_lat, max_lng = shape.bbox
+                lat_cells = range(math.floor(min_lat / cell_degrees), math.floor(max_lat / cell_degrees) + 1)
+                lng_cells = range(math.floor(min_lng / cell_degrees), math.floor(max_lng / cell_degrees) + 1)
+                if len(lat_cells) * len(lng_cells) > max_cells:
+                    self.oversized.append((branch_id, shape))
+                    continue
+                for x in lat_cells:
+                    for y in lng_cells:
+                        self.cells.setdefault((x, y), []).append((branch_id, shape))
+
+    def status(self, branch_id, lat: Optional[float], lng: Optional[float], cell_degrees: float) -> Optional[str]:
+        """inside/outside/no_location, or None when no fence applies.
+
+        Only the user's own branch fences apply: a user without a branch, or
+        whose branch has no fence, is unfenced.
+        """
+        if branch_id is None or branch_id not in self.branches:
+            return None
+        if lat is None or lng is None:
+            return NO_LOCATION
+        candidates = self.cells.get((math.floor(lat / cell_degrees), math.floor(lng / cell_degrees)), ())
+        for owner, shape in (*candidates, *self.oversized):
+            if owner != branch_id:
+                continue
+            min_lat, min_lng, max_lat, max_lng = shape.bbox
+            if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng and shape.contains(lat, lng):
+                return INSIDE
+        return OUTSIDE
+
+
+class GeofenceCache:
+    """Per-tenant cache of parsed branch fences for the clock-in hot path.
+
+    A tenant's branches are loaded and parsed in one query; after that a
+    check is a grid-cell lookup plus a point-in-shape test against the few
+    fences in that cell. The tenant is reloaded when a branch changes on
+    this worker (``invalidate``) and, for changes made by other workers,
+    when the tenant's branch fingerprint moves.
+    """
+
+    def __init__(self, recheck_seconds: float, cell_degrees: float, max_cells: int):
+        self.recheck_seconds = recheck_seconds
+        self.cell_degrees = cell_degrees
+        self.max_cells = max_cells
+        self._tenants: Dict[str, TenantFences] = {}
+        self._lock = threading.Lock()
+        self.compilations = 0
+        self.checks = 0
+        self.outcomes: Dict[str, int] = {}
+
+    def _fingerprint(self, db: Session, tenant_id):
+        return tuple(db.execute(
+            select(func.count(Branch.id), func.max(func.coalesce(Branch.updated_at, Branch.created_at)))
+            .where(Branch.tenant_id == tenant_id)
+        ).one())
+
+    def _load(self, db: Session, tenant_id, fingerprint) -> TenantFences:
+        fences = {}
+        rows = db.execute(
+            select(Branch.id, Branch.name, Branch.geo_fence).where(Branch.tenant_id == tenant_id)
+        ).all()
+        for branch_id, name, raw in rows:
+            try:
+                fences[branch_id] = parse_geo_fence(raw)
+            except ValueError as e:
+                print(f"[WARN] Branch '{name}' has an unreadable geo_fence, not checking it: {e}")
+        self.compilations += 1
+        return TenantFences(fences, fingerprint, self.cell_degrees, self.max_cells)
+
+    def tenant(self, db: Session, tenant_id) -> TenantFences:
+        key = str(tenant_id)
+        compiled = self._tenants.get(key)
+        if compiled is not None and time.monotonic() - compiled.checked_at < self.recheck_seconds:
+            return compiled
+        fingerprint = self._fingerprint(db, tenant_id)
+        if compiled is not None and compiled.fingerprint == fingerprint:
+            compiled.checked_at = time.monotonic()
+            return compiled
+        compiled = self._load(db, tenant_id, fingerprint)
+        with self._lock:
+            self._tenants[key] = compiled
+        return compiled
+
+    def status(self, fences: TenantFences, branch_id, lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+        result = fences.status(branch_id, lat, lng, self.cell_degrees)
+        self.checks += 1
+        outcome = result or "unfenced"
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        return result
+
+    def status_for(self, db: Session, principal: Principal, lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+        """Where a punch at (lat, lng) falls relative to the user's branch fences"""
+        return self.status(self.tenant(db, principal.tenant_id), principal.branch_id, lat, lng)
+
+    def invalidate(self, tenant_id=None):
+        """Reload one tenant's fences on next use, or every tenant's"""
+        with self._lock:
+            if tenant_id is None:
+                self._tenants.clear()
+            else:
+                self._tenants.pop(str(tenant_id), None)
+
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._tenants),
+            "compilations": self.compilations,
+            "checks": self.checks,
+            "outcomes": dict(self.outcomes),
+            "enforced": GEOFENCE_ENFORCE,
+        }
+
+
+geofence_cache = GeofenceCache(GEOFENCE_RECHECK_SECONDS, GEOFENCE_GRID_DEGREES, GEOFENCE_MAX_CELLS_PER_FENCE)
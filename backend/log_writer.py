@@ -0,0 +1,158 @@
+# log_writer.py
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, statement_counter
+from models import AttendanceLog
+
+# "sync" writes each AttendanceLog inside the punch transaction; "write_behind"
+# commits the session state first and hands the log row to a background writer
+ATTENDANCE_LOG_MODE = os.getenv("ATTENDANCE_LOG_MODE", "sync")
+ATTENDANCE_LOG_QUEUE_SIZE = int(os.getenv("ATTENDANCE_LOG_QUEUE_SIZE", "10000"))
+ATTENDANCE_LOG_BATCH_SIZE = int(os.getenv("ATTENDANCE_LOG_BATCH_SIZE", "500"))
+ATTENDANCE_LOG_FLUSH_MS = float(os.getenv("ATTENDANCE_LOG_FLUSH_MS", "50"))
+
+_STOP = object()
+
+
+class AttendanceLogWriter:
+    """Group-commit writer for AttendanceLog rows.
+
+    In write-behind mode a daemon thread drains a bounded queue and inserts
+    up to ``batch_size`` rows per multi-row INSERT and commit, waiting at
+    most ``flush_ms`` for a batch to fill. When the queue is full the row
+    is written synchronously instead, so a slow database pushes back on
+    punches rather than growing memory. Rows still queued when the process
+    dies are lost; ``stop`` flushes them on a clean shutdown.
+    """
+
+    def __init__(self, mode: str, max_queue: int, batch_size: int, flush_ms: float):
+        if mode not in ("sync", "write_behind"):
+            raise ValueError(f"Unknown attendance log mode: {mode}")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+    @property
+    def write_behind(self) -> bool:
+        return self.mode == "write_behind"
+
+    def start(self):
+        if self.write_behind and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="attendance-log-writer", daemon=True)
+            self._thread.start()
+            print(f"[SERVER] Attendance log writer started (batch {self.batch_size}, {self.flush_seconds * 1000:.0f}ms).")
+
+    def stop(self):
+        """Flush everything queued so far and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+            print(f"[SERVER] Attendance log writer stopped after writing {self.written} rows.")
+
+    def submit(self, db: Session, row: dict) -> dict:
+        """Queue a log row whose punch has already committed; returns the row as it will be stored"""
+        row.setdefault("created_at", datetime.now(timezone.utc))
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(row)
+                self.enqueued += 1
+                return dict(row)
+            except queue.Full:
+                pass
+        # Writer not running or saturated: write it now in its own transaction
+        self.fallbacks += 1
+        db.execute(AttendanceLog.__table__.insert().values(row))
+        db.commit()
+        return row
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [row for row in batch if row is not _STOP]
+                # Drain whatever arrived before the stop marker
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            for offset in range(0, len(batch), self.batch_size):
+                self._flush(batch[offset:offset + self.batch_size], retry=not stopping)
+
+    def _flush(self, rows, retry: bool):
+        if not rows:
+            return
+        backoff = 0.1
+        while True:
+            db = SessionLocal()
+            try:
+                with statement_counter.track("attendance_log_flush"):
+                    db.execute(AttendanceLog.__table__.insert(), rows)
+                    db.commit()
+                self.written += len(rows)
+                self.batches += 1
+                return
+            except (IntegrityError, DataError) as e:
+                # A bad row fails the same way on every retry: write rows one by one to isolate it
+                db.rollback()
+                self.failures += 1
+                if len(rows) == 1:
+                    print(f"[ERROR] Dropping attendance log row {rows[0].get('id')}: {e}")
+                    return
+                print(f"[ERROR] Attendance log batch of {len(rows)} rows rejected, retrying row by row: {e}")
+                for row in rows:
+                    self._flush([row], retry)
+                return
+            except Exception as e:
+                db.rollback()
+                self.failures += 1
+                print(f"[ERROR] Attendance log flush of {len(rows)} rows failed: {e}")
+                if not retry:
+                    print(f"[ERROR] Dropping {len(rows)} attendance log rows at shutdown.")
+                    return
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+            finally:
+                db.close()
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "failures": self.failures,
+        }
+
+
+log_writer = AttendanceLogWriter(
+    ATTENDANCE_LOG_MODE, ATTENDANCE_LOG_QUEUE_SIZE, ATTENDANCE_LOG_BATCH_SIZE, ATTENDANCE_LOG_FLUSH_MS
+)
@@ -2,7 +2,7 @@
 from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Index, Date, Float, Integer, JSON
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from database import Base
 import uuid
 
@@ -27,6 +27,7 @@ class User(Base):
     name = Column(String, nullable=True)  # Full name for user profile context
     phone = Column(String, nullable=True)
     status = Column(String, default="active")  # active, inactive, suspended
+    timezone = Column(String(64), nullable=True)  # IANA name; overrides the tenant's
     
     # Relationships
     roles = relationship("Role", secondary="user_roles", back_populates="users")
@@ -102,10 +103,56 @@ class UserSession(Base):
     expires_at = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_active = Column(Boolean, default=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
     
     __table_args__ = (
         Index('idx_session_user_active', 'user_id', 'is_active'),
         Index('idx_session_token_expires', 'token_hash', 'expires_at'),
+        Index('idx_session_revoked_at', 'revoked_at'),
+    )
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    tenant_id = Column(UUID(as_uuid=True), nullable=True)
+    family_id = Column(UUID(as_uuid=True), nullable=False)  # All rotations of one login share a family
+    token_hash = Column(String(64), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index('idx_refresh_token_hash', 'token_hash', unique=True),
+        Index('idx_refresh_token_family', 'family_id'),
+        Index('idx_refresh_token_user', 'user_id'),
+    )
+
+class ResetToken(Base):
+    __tablename__ = "reset_tokens"
+    
+    token_hash = Column(String(64), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('idx_reset_token_expires', 'expires_at'),
+    )
+
+class AuthzVersion(Base):
+    """Per-user authorization version, bumped whenever roles or access-relevant fields change"""
+    __tablename__ = "authz_versions"
+    
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    tenant_id = Column(UUID(as_uuid=True), nullable=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index('idx_authz_version_updated', 'updated_at'),
     )
 
 class Tenant(Base):
@@ -114,6 +161,7 @@ class Tenant(Base):
     name = Column(String, unique=True, nullable=False)
     contact_email = Column(String, nullable=False)
     plan = Column(String, default="basic")
+    timezone = Column(String(64), nullable=True)  # IANA name for attendance days, e.g. Asia/Kolkata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Client(Base):
@@ -176,9 +224,15 @@ class Attendance(Base):
     shift_type = Column(String, nullable=True)  # Regular, Night, Flexible, etc.
     work_mode = Column(String, nullable=True)  # Office, WFH, Hybrid
     policy_id = Column(UUID(as_uuid=True), ForeignKey("policies.id"), nullable=True)
+    revision = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped by every punch, under the row lock
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # One row per user per day; clock-in upserts against this
+    __table_args__ = (
+        Index('idx_attendance_tenant_user_date', 'tenant_id', 'user_id', 'date', unique=True),
+    )
+
 class AttendanceSession(Base):
     __tablename__ = "attendance_sessions"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -194,6 +248,14 @@ class AttendanceSession(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Punches on one day are serialized by the row lock on its attendance row;
+    # these make a lost race fail loudly instead of duplicating a session
+    __table_args__ = (
+        Index('idx_attendance_session_one_open', 'attendance_id', unique=True,
+              postgresql_where=text('clock_out IS NULL')),
+        Index('idx_attendance_session_number', 'attendance_id', 'session_number', unique=True),
+    )
+
 class AttendanceLog(Base):
     __tablename__ = "attendance_logs"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -213,8 +275,17 @@ class AttendanceLog(Base):
     work_mode = Column(String, nullable=True)  # Office, WFH, Hybrid
     policy_applied = Column(String, nullable=True)  # Policy name that was applied
     status = Column(String, nullable=True)  # On Time, Late, Early, etc.
+    idempotency_key = Column(String(100), nullable=True)  # Set by offline batch uploads
+    geofence_status = Column(String(20), nullable=True)  # inside, outside, no_location; NULL if no fence applies
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index('idx_attendance_log_idempotency', 'tenant_id', 'user_id', 'idempotency_key', unique=True,
+              postgresql_where=text('idempotency_key IS NOT NULL')),
+        Index('idx_attendance_log_user_timestamp', 'tenant_id', 'user_id', 'timestamp'),
+        Index('idx_attendance_log_attendance', 'attendance_id', 'timestamp'),
+    )
+
 # Enhanced Policy Models
 class Policy(Base):
     __tablename__ = "policies"
@@ -251,6 +322,7 @@ class Holiday(Base):
     description = Column(Text)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 class WeekOff(Base):
     __tablename__ = "week_offs"
@@ -259,6 +331,7 @@ class WeekOff(Base):
     day_of_week = Column(Integer, nullable=False)  # 0=Monday, 6=Sunday
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 # Leave Models
 class LeaveType(Base):
@@ -273,6 +346,7 @@ class LeaveType(Base):
     color = Column(String, default="#2196F3")
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 class LeaveRequest(Base):
     __tablename__ = "leave_requests"
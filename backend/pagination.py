@@ -0,0 +1,100 @@
+# pagination.py
+"""Keyset pagination and streamed JSON lists for per-user history endpoints.
+
+Pages are ordered newest first by (sort key, id). The cursor handed to the
+client is an opaque token for the last row of a page; the next page starts
+strictly after it, so it stays stable while new punches arrive.
+"""
+import base64
+import json
+import os
+import uuid
+from datetime import date, datetime
+from typing import Iterator, Optional, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import Select
+
+from database import SessionLocal
+from fast_json import FAST_JSON, orjson
+
+# Page size when the caller does not pass ?limit=, and the largest one allowed
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "200"))
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "1000"))
+# Rows fetched per round-trip from the server-side cursor in streaming mode
+HISTORY_STREAM_BATCH = int(os.getenv("HISTORY_STREAM_BATCH", "1000"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(key, row_id) -> str:
+    value = key.isoformat() if isinstance(key, (date, datetime)) else key
+    raw = json.dumps([value, str(row_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type):
+    """(key, id) from a cursor made by encode_cursor; 400 if it was tampered with"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        return key_type.fromisoformat(value), uuid.UUID(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_size(limit: Optional[int]) -> int:
+    if limit is None:
+        return HISTORY_PAGE_SIZE
+    if limit < 1 or limit > HISTORY_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {HISTORY_PAGE_MAX}")
+    return limit
+
+
+def newest_first(query: Select, key_column, id_column, cursor: Optional[str], key_type) -> Select:
+    """Order by (key, id) descending, starting after ``cursor`` if given.
+
+    The bound is written so the key column alone is range-restricted, which
+    keeps it usable by an index that ends in the key.
+    """
+    if cursor:
+        key, row_id = decode_cursor(cursor, key_type)
+        query = query.where(
+            key_column <= key,
+            or_(key_column < key, and_(key_column == key, id_column < row_id)),
+        )
+    return query.order_by(key_column.desc(), id_column.desc())
+
+
+def next_cursor(rows, limit: int, key_attr: str) -> Optional[str]:
+    """Cursor for the page after ``rows`` when the query fetched ``limit + 1`` of them"""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(getattr(last, key_attr), last.id)
+
+
+def stream_json_list(query: Select, model: Type[BaseModel]) -> Iterator[bytes]:
+    """Yield ``query``'s rows as one JSON list, reading from a server-side cursor.
+
+    Runs in its own session because the response outlives the request's
+    dependencies; memory stays at one fetch batch whatever the row count.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(stream_results=True, yield_per=HISTORY_STREAM_BATCH))
+        yield b"["
+        first = True
+        for row in result.mappings():
+            if FAST_JSON:
+                # Rows hold exactly the model's columns, so they encode as-is
+                item = orjson.dumps(dict(row), option=orjson.OPT_UTC_Z)
+            else:
+                item = model.model_validate(dict(row)).model_dump_json().encode()
+            yield (b"" if first else b",") + item
+            first = False
+        yield b"]"
+    finally:
+        db.close()
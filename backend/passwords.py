@@ -0,0 +1,171 @@
+# passwords.py
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException, status
+from sqlalchemy import update
+
+from database import SessionLocal
+from models import User
+
+# bcrypt work factor; run calibrate_bcrypt.py on the deployment host to pick one
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Password hashing pool configuration
+BCRYPT_POOL_WORKERS = int(os.getenv("BCRYPT_POOL_WORKERS", str(os.cpu_count() or 2)))
+BCRYPT_POOL_MAX_QUEUE = int(os.getenv("BCRYPT_POOL_MAX_QUEUE", "64"))
+
+
+class PasswordHasherPool:
+    """Bounded worker pool for bcrypt hashing and verification.
+
+    bcrypt releases the GIL while it works, so a thread pool keeps the event
+    loop free without the pickling overhead of a process pool. Work beyond
+    ``max_workers + max_queue`` outstanding jobs is rejected with a 503
+    instead of piling up behind a login storm.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _reserve(self):
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service is busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def _submit(self, fn, *args):
+        self._reserve()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # Release on completion rather than when the caller stops waiting,
+        # so cancelled requests still count against the queue until the
+        # worker is actually free again.
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args):
+        """Run ``fn`` on the pool from async code."""
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def run_sync(self, fn, *args):
+        """Run ``fn`` on the pool from a sync endpoint (already off the event loop)."""
+        return self._submit(fn, *args).result()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_pool = PasswordHasherPool(BCRYPT_POOL_WORKERS, BCRYPT_POOL_MAX_QUEUE)
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+
+def hash_cost(hashed_password: str):
+    """Work factor of a modular-crypt bcrypt hash such as ``$2b$12$...``"""
+    parts = hashed_password.split("$") if hashed_password else []
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when a stored hash was made with a different cost than configured"""
+    cost = hash_cost(hashed_password)
+    return cost is not None and cost != BCRYPT_ROUNDS
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    if not hashed_password:
+        # Users added by an admin have no password until they reset it
+        return False
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except ValueError:
+        return False
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password on the shared pool"""
+    return await password_pool.run(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    """Verify a password against its bcrypt hash on the shared pool"""
+    return await password_pool.run(_verify, password, hashed_password)
+
+
+def hash_password_sync(password: str) -> str:
+    """Hash a password on the shared pool from a sync endpoint"""
+    return password_pool.run_sync(_hash, password)
+
+
+def verify_password_sync(password: str, hashed_password: str) -> bool:
+    """Verify a password on the shared pool from a sync endpoint"""
+    return password_pool.run_sync(_verify, password, hashed_password)
+
+
+def rehash_password(user_id, password: str, old_hash: str):
+    """Re-hash a password at the configured cost after a successful login.
+
+    Runs as a background task after the response is sent; being a plain
+    function, Starlette runs it in the threadpool so neither the hash wait
+    nor the database write blocks the event loop. The update only
+    applies if the stored hash is still the one that was verified, so a
+    concurrent password change always wins.
+    """
+    try:
+        new_hash = hash_password_sync(password)
+    except HTTPException:
+        # Pool is saturated; try again on a later login
+        return
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+        )
+        db.commit()
+        if result.rowcount:
+            print(f"[AUTH] Rehashed password for user {user_id} at cost {BCRYPT_ROUNDS}.")
+    finally:
+        db.close()
@@ -0,0 +1,176 @@
+# permissions.py
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import Text, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+
+from auth import Principal, get_current_user
+from database import get_db
+from models import Permission, Role, RolePermission
+
+# How often a worker re-checks a tenant's grant fingerprint for changes made elsewhere
+PERMISSION_RECHECK_SECONDS = float(os.getenv("PERMISSION_RECHECK_SECONDS", "10"))
+
+# Roles that bypass the matrix entirely
+SUPERUSER_ROLES = ("admin",)
+
+# Grants used by tenants that have not configured any role permissions yet
+DEFAULT_ROLE_GRANTS = {
+    "manager": ["users:read", "dashboard:read", "reports:read"],
+    "user": ["profile:read", "profile:write"],
+}
+
+ALL_PERMISSIONS = -1  # every bit set
+
+
+def permission_key(resource: str, action: str) -> str:
+    return f"{resource}:{action}"
+
+
+class CompiledTenant:
+    """Per-role permission bitsets of one tenant"""
+
+    __slots__ = ("role_masks", "fingerprint", "checked_at", "_combined")
+
+    def __init__(self, role_masks: Dict[str, int], fingerprint):
+        self.role_masks = role_masks
+        self.fingerprint = fingerprint
+        self.checked_at = time.monotonic()
+        self._combined: Dict[Tuple[str, ...], int] = {}
+
+    def mask_for(self, role_names: Tuple[str, ...]) -> int:
+        mask = self._combined.get(role_names)
+        if mask is None:
+            mask = 0
+            for role in role_names:
+                mask |= self.role_masks.get(role, 0)
+            self._combined[role_names] = mask
+        return mask
+
+
+class PermissionEngine:
+    """Compiles Permission/RolePermission grants into per-role bitsets.
+
+    Every ``resource:action`` gets a bit the first time it is seen; bits are
+    never reused within a worker. A tenant is recompiled only when its grants
+    change: locally through ``invalidate`` and, for changes made by other
+    workers, when the tenant's fingerprint (grant count and latest
+    created_at, role count and a digest of role ids and names) moves.
+    """
+
+    def __init__(self, recheck_seconds: float):
+        self.recheck_seconds = recheck_seconds
+        self._bits: Dict[str, int] = {}
+        self._tenants: Dict[str, CompiledTenant] = {}
+        self._lock = threading.Lock()
+        self.compilations = 0
+
+    def bit(self, key: str) -> int:
+        bit = self._bits.get(key)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(key, 1 << len(self._bits))
+        return bit
+
+    def compile_grants(self, grants: Iterable[Tuple[str, str]], fingerprint=None) -> CompiledTenant:
+        """Build role bitsets from ``(role_name, permission_key)`` pairs"""
+        role_masks: Dict[str, int] = {}
+        for role_name, key in grants:
+            role_masks[role_name] = role_masks.get(role_name, 0) | self.bit(key)
+        for role_name in SUPERUSER_ROLES:
+            role_masks[role_name] = ALL_PERMISSIONS
+        self.compilations += 1
+        return CompiledTenant(role_masks, fingerprint)
+
+    def _fingerprint(self, db: Session, tenant_id):
+        grants = select(func.count(RolePermission.id), func.max(RolePermission.created_at)).join(
+            Role, Role.id == RolePermission.role_id
+        ).where(Role.tenant_id == tenant_id).subquery()
+        # Masks are keyed by role name, so a rename must move the fingerprint too
+        roles = select(
+            func.count(Role.id),
+            func.md5(func.coalesce(func.string_agg(
+                cast(Role.id, Text) + ":" + Role.name, aggregate_order_by(literal_column("','"), Role.id)
+            ), ""))
+        ).where(Role.tenant_id == tenant_id).subquery()
+        return tuple(db.execute(select(grants, roles)).one())
+
+    def _load(self, db: Session, tenant_id, fingerprint) -> CompiledTenant:
+        rows = db.query(Role.name, Permission.resource, Permission.action).join(
+            RolePermission, RolePermission.role_id == Role.id
+        ).join(
+            Permission, Permission.id == RolePermission.permission_id
+        ).filter(Role.tenant_id == tenant_id).all()
+        if rows:
+            grants = [(role_name, permission_key(resource, action)) for role_name, resource, action in rows]
+        else:
+            grants = [(role_name, key) for role_name, keys in DEFAULT_ROLE_GRANTS.items() for key in keys]
+        return self.compile_grants(grants, fingerprint)
+
+    def tenant(self, db: Session, tenant_id) -> CompiledTenant:
+        key = str(tenant_id)
+        compiled = self._tenants.get(key)
+        if compiled is not None and time.monotonic() - compiled.checked_at < self.recheck_seconds:
+            return compiled
+        fingerprint = self._fingerprint(db, tenant_id)
+        if compiled is not None and compiled.fingerprint == fingerprint:
+            compiled.checked_at = time.monotonic()
+            return compiled
+        compiled = self._load(db, tenant_id, fingerprint)
+        self._tenants[key] = compiled
+        return compiled
+
+    def invalidate(self, tenant_id=None):
+        """Force recompilation of one tenant, or of every tenant"""
+        if tenant_id is None:
+            self._tenants.clear()
+        else:
+            self._tenants.pop(str(tenant_id), None)
+
+    def allows(self, db: Session, principal: Principal, bit: int) -> bool:
+        return bool(self.tenant(db, principal.tenant_id).mask_for(principal.role_names) & bit)
+
+    def stats(self) -> dict:
+        return {"tenants": len(self._tenants), "permissions": len(self._bits), "compilations": self.compilations}
+
+
+permission_engine = PermissionEngine(PERMISSION_RECHECK_SECONDS)
+
+
+def check_permission(db: Session, user: Principal, resource: str, action: str) -> bool:
+    """Check if user has specific permission"""
+    return permission_engine.allows(db, user, permission_engine.bit(permission_key(resource, action)))
+
+
+def require_permission(resource: str, action: str):
+    """Permission-based access control dependency, tenant-aware"""
+    bit = permission_engine.bit(permission_key(resource, action))
+
+    async def permission_checker(
+        current_user: Principal = Depends(get_current_user),
+        db: Session = Depends(get_db)
+    ):
+        if not permission_engine.allows(db, current_user, bit):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Access denied. Required permission: {resource}:{action}"
+            )
+        return current_user
+    return permission_checker
+
+
+def ensure_default_permissions(db: Session):
+    """Make sure the default permissions exist so tenants can grant them"""
+    existing = {name for (name,) in db.query(Permission.name).all()}
+    for keys in DEFAULT_ROLE_GRANTS.values():
+        for key in keys:
+            if key not in existing:
+                resource, action = key.split(":", 1)
+                db.add(Permission(name=key, resource=resource, action=action, description=f"{action.capitalize()} {resource}"))
+                existing.add(key)
+    db.commit()
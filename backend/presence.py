@@ -0,0 +1,366 @@
+# presence.py
+"""Who is clocked in right now, kept in memory on every worker.
+
+For each user the index holds their latest attendance day: the open
+session's start and number (if any) and the day's totals. Punches publish
+the new state with ``pg_notify`` inside their own transaction, so it is
+delivered to every worker's listener only if and when the punch commits,
+and in commit order. The punching request also applies its state locally
+right after commit; each state carries the attendance row's revision
+(bumped under the row lock), so whichever path arrives late is ignored. The listener rebuilds the index from the open sessions
+(a scan of the partial ``clock_out IS NULL`` index) whenever it (re)connects.
+While it is disconnected the index is not trusted and reads go to the
+database. Entries for days before the user's local today are stale: the
+roster leaves them out and the listener evicts them periodically, so the
+index holds roughly today's active users rather than everyone ever seen.
+"""
+import json
+import os
+import select
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select as sql_select, text
+from sqlalchemy.orm import Session
+
+from auth import Principal
+from database import engine
+from models import Attendance, AttendanceSession
+from timeutils import local_today
+
+# Serve current-session and the roster from memory; "false" reads the database every time
+PRESENCE_INDEX = os.getenv("PRESENCE_INDEX", "true").lower() == "true"
+# Pause before the listener reconnects after losing its connection
+PRESENCE_RECONNECT_SECONDS = float(os.getenv("PRESENCE_RECONNECT_SECONDS", "2"))
+# How often the listener evicts entries for days before each user's local today
+PRESENCE_PRUNE_SECONDS = float(os.getenv("PRESENCE_PRUNE_SECONDS", "300"))
+
+PRESENCE_CHANNEL = "attendance_presence"
+
+# Open sessions on each user's latest attendance day (an older day left open is not "in")
+OPEN_SESSIONS_SQL = """
+    SELECT s.tenant_id, s.user_id, a.date, a.id AS attendance_id, s.session_number, s.clock_in,
+           a.total_sessions, a.total_work_hours, a.status, a.revision, coalesce(u.timezone, t.timezone) AS timezone
+    FROM attendance_sessions s
+    JOIN attendance a ON a.id = s.attendance_id
+    JOIN users u ON u.id = s.user_id
+    JOIN tenants t ON t.id = s.tenant_id
+    WHERE s.clock_out IS NULL {tenant_filter}
+      AND NOT EXISTS (
+          SELECT 1 FROM attendance later
+          WHERE later.tenant_id = a.tenant_id AND later.user_id = a.user_id AND later.date > a.date
+      )
+"""
+
+
+def open_sessions_query(tenant_id=None):
+    """The rebuild scan, for every tenant or just ``tenant_id``"""
+    if tenant_id is None:
+        return text(OPEN_SESSIONS_SQL.format(tenant_filter=""))
+    return text(OPEN_SESSIONS_SQL.format(tenant_filter="AND s.tenant_id = :tenant_id")).bindparams(tenant_id=tenant_id)
+
+
+def user_presence_query(tenant_id, user_id, day: date):
+    """One user's attendance row for ``day`` with its open session, if any"""
+    return sql_select(
+        Attendance.tenant_id, Attendance.user_id, Attendance.date, Attendance.id.label("attendance_id"),
+        AttendanceSession.session_number, AttendanceSession.clock_in,
+        Attendance.total_sessions, Attendance.total_work_hours, Attendance.status, Attendance.revision
+    ).outerjoin(
+        AttendanceSession,
+        (AttendanceSession.attendance_id == Attendance.id) & AttendanceSession.clock_out.is_(None)
+    ).where(
+        Attendance.tenant_id == tenant_id,
+        Attendance.user_id == user_id,
+        Attendance.date == day
+    )
+
+
+@dataclass(frozen=True)
+class Presence:
+    """A user's latest attendance day; ``clock_in`` is set while a session is open"""
+    tenant_id: str
+    user_id: str
+    date: date
+    attendance_id: Optional[str] = None
+    session_number: Optional[int] = None
+    clock_in: Optional[datetime] = None
+    total_sessions: int = 0
+    total_work_hours: float = 0.0
+    status: Optional[str] = None
+    # The user's timezone (theirs, else the tenant's), which decides when ``date`` is over
+    timezone: Optional[str] = None
+    # The attendance row's revision; of two states for the same day the higher one is newer
+    revision: int = 0
+
+    @classmethod
+    def from_row(cls, row, tz_name: Optional[str]) -> "Presence":
+        clock_in = row.clock_in
+        if clock_in is not None and clock_in.tzinfo is None:
+            clock_in = clock_in.replace(tzinfo=timezone.utc)
+        return cls(
+            tenant_id=str(row.tenant_id),
+            user_id=str(row.user_id),
+            date=row.date,
+            attendance_id=str(row.attendance_id) if row.attendance_id else None,
+            session_number=row.session_number if clock_in is not None else None,
+            clock_in=clock_in,
+            total_sessions=row.total_sessions or 0,
+            total_work_hours=row.total_work_hours or 0.0,
+            status=row.status,
+            timezone=tz_name,
+            revision=row.revision or 0,
+        )
+
+    def stale(self, now: Optional[datetime] = None) -> bool:
+        """True once ``date`` is before the user's local today"""
+        return self.date < local_today(self.timezone, now)
+
+    def to_payload(self) -> str:
+        return json.dumps({
+            "tenant_id": self.tenant_id,
+            "user_id": self.user_id,
+            "date": self.date.isoformat(),
+            "attendance_id": self.attendance_id,
+            "session_number": self.session_number,
+            "clock_in": self.clock_in.isoformat() if self.clock_in else None,
+            "total_sessions": self.total_sessions,
+            "total_work_hours": self.total_work_hours,
+            "status": self.status,
+            "timezone": self.timezone,
+            "revision": self.revision,
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "Presence":
+        return cls(
+            tenant_id=data["tenant_id"],
+            user_id=data["user_id"],
+            date=date.fromisoformat(data["date"]),
+            attendance_id=data.get("attendance_id"),
+            session_number=data.get("session_number"),
+            clock_in=datetime.fromisoformat(data["clock_in"]) if data.get("clock_in") else None,
+            total_sessions=data.get("total_sessions") or 0,
+            total_work_hours=data.get("total_work_hours") or 0.0,
+            status=data.get("status"),
+            timezone=data.get("timezone"),
+            revision=data.get("revision") or 0,
+        )
+
+
+class PresenceIndex:
+    """Per-worker presence of every user, kept current by a LISTEN thread.
+
+    ``current`` answers from memory when the user's entry is for the asked
+    day and loads (then keeps) it from the database otherwise, e.g. the
+    first poll of a day. A load never overwrites a newer notification that
+    arrived while it ran. ``roster`` lists a tenant's open sessions of today
+    without touching the database.
+    """
+
+    def __init__(self, enabled: bool, reconnect_seconds: float, prune_seconds: float):
+        self.enabled = enabled
+        self.reconnect_seconds = reconnect_seconds
+        self.prune_seconds = prune_seconds
+        self._users: Dict[str, Presence] = {}
+        self._open: Dict[str, Dict[str, Presence]] = {}
+        # Sequence number of the last change applied to each user, and of the last rebuild
+        self._applied: Dict[str, int] = {}
+        self._sequence = 0
+        self._rebuilt_at = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.live = False
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.notifications = 0
+        self.rebuilds = 0
+        self.reconnects = 0
+        self.evicted = 0
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="presence-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def _connect(self):
+        # A dedicated connection: LISTEN must not hold (or be returned to) a pool slot
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        connection = engine.dialect.connect(*cargs, **cparams)
+        connection.autocommit = True
+        return connection
+
+    def _run(self):
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                connection.cursor().execute(f"LISTEN {PRESENCE_CHANNEL}")
+                # Listening first means nothing committed after the snapshot is missed;
+                # replaying notifications older than it ends in the same state
+                self.rebuild()
+                self.live = True
+                print(f"[SERVER] Presence index live ({self.stats()['clocked_in']} users clocked in).")
+                pruned_at = time.monotonic()
+                while not self._stopping.is_set():
+                    if time.monotonic() - pruned_at >= self.prune_seconds:
+                        self.prune()
+                        pruned_at = time.monotonic()
+                    if select.select([connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self._receive(connection.notifies.pop(0).payload)
+            except Exception as e:
+                self.reconnects += 1
+                print(f"[ERROR] Presence listener failed, serving from the database until it reconnects: {e}")
+            finally:
+                self.live = False
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+            self._stopping.wait(self.reconnect_seconds)
+
+    def _receive(self, payload: str):
+        self.notifications += 1
+        data = json.loads(payload)
+        if data.get("rebuild"):
+            self.rebuild()
+        else:
+            self.apply(Presence.from_payload(data))
+
+    def _load_open(self, tenant_id=None) -> List[Presence]:
+        with engine.connect() as connection:
+            rows = connection.execute(open_sessions_query(tenant_id)).all()
+        now = datetime.now(timezone.utc)
+        entries = (Presence.from_row(row, row.timezone) for row in rows)
+        # A session left open on an earlier day is a missed clock-out, not someone who is in
+        return [entry for entry in entries if not entry.stale(now)]
+
+    def rebuild(self):
+        """Replace the index with today's open sessions in the database"""
+        entries = self._load_open()
+        with self._lock:
+            self._sequence += 1
+            self._rebuilt_at = self._sequence
+            self._users = {entry.user_id: entry for entry in entries}
+            self._open = {}
+            for entry in entries:
+                self._open.setdefault(entry.tenant_id, {})[entry.user_id] = entry
+            self._applied = {}
+            self.rebuilds += 1
+
+    def apply(self, entry: Presence):
+        """Record a committed change, unless the state held is for a later day or a later revision"""
+        with self._lock:
+            known = self._users.get(entry.user_id)
+            if known is not None and (entry.date, entry.revision) <= (known.date, known.revision):
+                return
+            self._sequence += 1
+            self._applied[entry.user_id] = self._sequence
+            self._users[entry.user_id] = entry
+            tenant = self._open.setdefault(entry.tenant_id, {})
+            if entry.clock_in is not None:
+                tenant[entry.user_id] = entry
+            else:
+                tenant.pop(entry.user_id, None)
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Evict every entry for a day before its user's local today"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            stale = [entry for entry in self._users.values() if entry.stale(now)]
+            for entry in stale:
+                del self._users[entry.user_id]
+                self._applied.pop(entry.user_id, None)
+                tenant = self._open.get(entry.tenant_id)
+                if tenant is not None and tenant.get(entry.user_id) is entry:
+                    del tenant[entry.user_id]
+                    if not tenant:
+                        del self._open[entry.tenant_id]
+            self.evicted += len(stale)
+        return len(stale)
+
+    def _load_user(self, db: Session, principal: Principal, day: date) -> Presence:
+        row = db.execute(user_presence_query(principal.tenant_id, principal.id, day)).first()
+        if row is None:
+            return Presence(
+                tenant_id=str(principal.tenant_id), user_id=str(principal.id), date=day, timezone=principal.timezone
+            )
+        return Presence.from_row(row, principal.timezone)
+
+    def current(self, db: Session, principal: Principal, day: date) -> Presence:
+        """The user's presence on local ``day``"""
+        user_id = str(principal.id)
+        if not self.live:
+            self.fallbacks += 1
+            return self._load_user(db, principal, day)
+        entry = self._users.get(user_id)
+        if entry is not None and entry.date == day:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        before = self._sequence
+        loaded = self._load_user(db, principal, day)
+        with self._lock:
+            if before >= self._rebuilt_at and self._applied.get(user_id, 0) <= before:
+                known = self._users.get(user_id)
+                if known is None or known.date <= day:
+                    self._users[user_id] = loaded
+            else:
+                newer = self._users.get(user_id)
+                if newer is not None and newer.date == day:
+                    return newer
+        return loaded
+
+    def roster(self, tenant_id) -> List[Presence]:
+        """Users of the tenant with an open session today, earliest clock-in first"""
+        if self.live:
+            now = datetime.now(timezone.utc)
+            entries = [entry for entry in list(self._open.get(str(tenant_id), {}).values()) if not entry.stale(now)]
+        else:
+            self.fallbacks += 1
+            entries = self._load_open(tenant_id)
+        return sorted(entries, key=lambda entry: entry.clock_in)
+
+    def publish(self, db, entry: Presence):
+        """Announce ``entry`` to every worker when the caller's transaction commits"""
+        if self.enabled:
+            db.execute(sql_select(func.pg_notify(PRESENCE_CHANNEL, entry.to_payload())))
+
+    def publish_rebuild(self, db):
+        """Make every worker reload the index when the caller's transaction commits"""
+        db.execute(sql_select(func.pg_notify(PRESENCE_CHANNEL, json.dumps({"rebuild": True}))))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "live": self.live,
+            "users": len(self._users),
+            "clocked_in": sum(len(tenant) for tenant in self._open.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "notifications": self.notifications,
+            "rebuilds": self.rebuilds,
+            "reconnects": self.reconnects,
+            "evicted": self.evicted,
+        }
+
+
+presence_index = PresenceIndex(PRESENCE_INDEX, PRESENCE_RECONNECT_SECONDS, PRESENCE_PRUNE_SECONDS)
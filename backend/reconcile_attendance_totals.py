@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Recompute attendance.total_work_hours from attendance_sessions and report drift.
+
+Clock-out maintains the daily total incrementally. This script recomputes it
+in bulk for one tenant and date range, lists every day whose stored total
+differs from the sum of its sessions, and fixes them (unless --dry-run).
+
+Usage:
+    python reconcile_attendance_totals.py --tenant-id <uuid> --from 2026-10-01 --to 2026-10-31
+"""
+
+import argparse
+import sys
+import os
+from datetime import date
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import text
+from database import engine
+from presence import presence_index
+
+# Stored total next to the sum of sessions for each attendance day in the range
+RECOMPUTED_SQL = """
+    SELECT a.id, a.user_id, a.date,
+           coalesce(a.total_work_hours, 0) AS stored,
+           coalesce(sum(s.work_hours), 0) AS actual
+    FROM attendance a
+    LEFT JOIN attendance_sessions s ON s.attendance_id = a.id
+    WHERE a.tenant_id = :tenant_id AND a.date BETWEEN :date_from AND :date_to
+    GROUP BY a.id
+"""
+
+
+def reconcile(tenant_id, date_from, date_to, tolerance, dry_run):
+    """Report days whose stored total drifted from their sessions and fix them in one UPDATE"""
+    params = {"tenant_id": tenant_id, "date_from": date_from, "date_to": date_to, "tolerance": tolerance}
+    with engine.begin() as connection:
+        checked = connection.execute(
+            text(f"SELECT count(*) FROM ({RECOMPUTED_SQL}) r"), params
+        ).scalar()
+        drifted = connection.execute(text(f"""
+            SELECT user_id, date, stored, actual FROM ({RECOMPUTED_SQL}) r
+            WHERE abs(stored - actual) > :tolerance
+            ORDER BY date, user_id
+        """), params).all()
+        if drifted and not dry_run:
+            connection.execute(text(f"""
+                UPDATE attendance a SET total_work_hours = r.actual, revision = a.revision + 1, updated_at = now()
+                FROM ({RECOMPUTED_SQL}) r
+                WHERE a.id = r.id AND abs(r.stored - r.actual) > :tolerance
+            """), params)
+            # Workers' presence indexes hold day totals; reload them once this commits
+            presence_index.publish_rebuild(connection)
+
+    print(f"🔎 Checked {checked} attendance days for tenant {tenant_id} ({date_from} to {date_to})")
+    for row in drifted:
+        print(f"   {row.date} user {row.user_id}: stored {row.stored:.4f}h, sessions {row.actual:.4f}h "
+              f"(drift {row.stored - row.actual:+.4f}h)")
+    if not drifted:
+        print("✅ No drift found")
+    elif dry_run:
+        print(f"⚠️  {len(drifted)} days drifted (dry run, nothing changed)")
+    else:
+        print(f"✅ Fixed {len(drifted)} drifted days")
+    return drifted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile attendance totals with their sessions")
+    parser.add_argument("--tenant-id", required=True)
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, required=True)
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="Allowed difference in hours")
+    parser.add_argument("--dry-run", action="store_true", help="Only report drift")
+    args = parser.parse_args()
+    reconcile(args.tenant_id, args.date_from, args.date_to, args.tolerance, args.dry_run)
@@ -0,0 +1,86 @@
+# refresh_tokens.py
+import os
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from auth import hash_token
+from models import RefreshToken
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+
+def _unauthorized(detail: str):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def issue_refresh_token(db: Session, user_id, tenant_id, family_id: Optional[uuid.UUID] = None) -> str:
+    """Add a refresh token to the session (the caller commits) and return it"""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        tenant_id=tenant_id,
+        family_id=family_id or uuid.uuid4(),
+        token_hash=hash_token(token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[RefreshToken, str]:
+    """Spend a refresh token and issue its successor in the same family.
+
+    The lookup is a single indexed read that locks the row, so two
+    concurrent refreshes with the same token cannot both succeed. Presenting
+    a token that was already spent means it leaked: the whole family is
+    revoked and the legitimate holder has to log in again.
+    """
+    now = datetime.now(timezone.utc)
+    row = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_token(token)
+    ).with_for_update().first()
+    if row is None or row.revoked_at is not None or row.expires_at <= now:
+        raise _unauthorized("Invalid or expired refresh token")
+    if row.used_at is not None:
+        revoke_refresh_family(db, row.family_id)
+        db.commit()
+        print(f"[AUTH] Refresh token reuse detected for user {row.user_id}, family revoked.")
+        raise _unauthorized("Refresh token reuse detected")
+    row.used_at = now
+    successor = issue_refresh_token(db, row.user_id, row.tenant_id, family_id=row.family_id)
+    return row, successor
+
+
+def revoke_refresh_family(db: Session, family_id):
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+
+
+def revoke_refresh_token(db: Session, token: str):
+    """Revoke the family of a presented refresh token (logout)"""
+    row = db.query(RefreshToken.family_id).filter(RefreshToken.token_hash == hash_token(token)).first()
+    if row:
+        revoke_refresh_family(db, row[0])
+        db.commit()
+
+
+def revoke_user_refresh_tokens(db: Session, user_id):
+    """Revoke every refresh token of a user (sign out everywhere)"""
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    db.commit()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Recompute attendance_logs.geofence_status against the current branch fences.
+
+Logs written before geofences were checked have no status, and a branch's
+fence may have been drawn or corrected since a punch was recorded. This
+script walks a tenant's logs in id order, in batches, checks each punch
+location against the fences of the user's *current* branch (users without
+a branch are unfenced, as at clock-in), and writes back the rows whose
+status changed. By default only logs without a status are
+looked at; pass --all to re-check every log in the range.
+
+Usage:
+    python revalidate_geofences.py --tenant-id <uuid> --from 2026-10-01 --to 2026-10-31
+    python revalidate_geofences.py --all-tenants --all --dry-run
+"""
+
+import argparse
+import sys
+import os
+import uuid
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+sys.path.append(os.path.dirname(__file__))
+
+from sqlalchemy import select, update
+
+from database import SessionLocal
+from geofence import geofence_cache
+from models import AttendanceLog, Department, Tenant, User
+
+
+def user_branches(db, tenant_id):
+    """Current branch of every user in the tenant (None for users without one, who are unfenced)"""
+    return dict(db.execute(
+        select(User.id, Department.branch_id)
+        .outerjoin(Department, Department.id == User.department_id)
+        .where(User.tenant_id == tenant_id)
+    ).all())
+
+
+def revalidate_tenant(db, tenant_id, date_from, date_to, recheck_all, batch_size, dry_run):
+    fences = geofence_cache.tenant(db, tenant_id)
+    branches = user_branches(db, tenant_id)
+    outcomes, changed, checked = Counter(), 0, 0
+    filters = [AttendanceLog.tenant_id == tenant_id]
+    if date_from:
+        filters.append(AttendanceLog.timestamp >= datetime.combine(date_from, time.min, timezone.utc))
+    if date_to:
+        filters.append(AttendanceLog.timestamp < datetime.combine(date_to + timedelta(days=1), time.min, timezone.utc))
+    if not recheck_all:
+        filters.append(AttendanceLog.geofence_status.is_(None))
+
+    last_id = None
+    while True:
+        query = select(
+            AttendanceLog.id, AttendanceLog.user_id, AttendanceLog.latitude,
+            AttendanceLog.longitude, AttendanceLog.geofence_status
+        ).where(*filters)
+        if last_id is not None:
+            query = query.where(AttendanceLog.id > last_id)
+        rows = db.execute(query.order_by(AttendanceLog.id).limit(batch_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            result = fences.status(branches.get(row.user_id), row.latitude, row.longitude, geofence_cache.cell_degrees)
+            outcomes[result or "unfenced"] += 1
+            if result != row.geofence_status:
+                updates.append({"id": row.id, "geofence_status": result})
+        checked += len(rows)
+        changed += len(updates)
+        if updates and not dry_run:
+            db.execute(update(AttendanceLog), updates)
+            db.commit()
+        else:
+            # Nothing to write: end the read transaction before the next batch
+            db.rollback()
+    return checked, changed, outcomes
+
+
+def main(args):
+    date_from = date.fromisoformat(args.date_from) if args.date_from else None
+    date_to = date.fromisoformat(args.date_to) if args.date_to else None
+    db = SessionLocal()
+    try:
+        if args.all_tenants:
+            tenant_ids = db.execute(select(Tenant.id).order_by(Tenant.id)).scalars().all()
+        else:
+            tenant_ids = [uuid.UUID(args.tenant_id)]
+        totals = Counter()
+        for tenant_id in tenant_ids:
+            checked, changed, outcomes = revalidate_tenant(
+                db, tenant_id, date_from, date_to, args.all, args.batch_size, args.dry_run
+            )
+            if checked:
+                print(f"🔎 Tenant {tenant_id}: {checked} logs checked, {changed} changed "
+                      f"({', '.join(f'{k}={v}' for k, v in sorted(outcomes.items()))})")
+            totals["checked"] += checked
+            totals["changed"] += changed
+    finally:
+        db.close()
+
+    if args.dry_run:
+        print(f"⚠️  {totals['changed']} of {totals['checked']} logs would change (dry run, nothing written)")
+    else:
+        print(f"✅ Updated {totals['changed']} of {totals['checked']} logs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute attendance log geofence status")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--tenant-id")
+    target.add_argument("--all-tenants", action="store_true")
+    parser.add_argument("--from", dest="date_from", help="First day (UTC), YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="Last day (UTC), YYYY-MM-DD")
+    parser.add_argument("--all", action="store_true", help="Re-check logs that already have a status")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    main(parser.parse_args())
@@ -1,9 +1,20 @@
 # schemas.py
-from pydantic import BaseModel, EmailStr, validator
-from typing import List, Optional, Dict, Any
+from pydantic import AfterValidator, BaseModel, EmailStr, validator
+from typing import Annotated, List, Optional, Dict, Any
 from datetime import datetime, date, time
 import uuid
 
+from timeutils import is_valid_timezone
+
+
+def _known_timezone(v: str) -> str:
+    if not is_valid_timezone(v):
+        raise ValueError('Timezone must be an IANA name such as Asia/Kolkata')
+    return v
+
+# An IANA timezone name, checked against the tz database
+Timezone = Annotated[str, AfterValidator(_known_timezone)]
+
 class UserCreate(BaseModel):
     email: EmailStr
     username: str
@@ -52,6 +63,7 @@ class UserResponse(BaseModel):
     project_id: Optional[uuid.UUID] = None
     department_id: Optional[uuid.UUID] = None
     role_id: Optional[uuid.UUID] = None
+    timezone: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -67,6 +79,13 @@ class RoleResponse(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
@@ -81,6 +100,7 @@ class UserUpdate(BaseModel):
     project_id: Optional[uuid.UUID] = None
     department_id: Optional[uuid.UUID] = None
     role_id: Optional[uuid.UUID] = None
+    timezone: Optional[Timezone] = None  # IANA name; None follows the tenant
 
 class RoleCreate(BaseModel):
     name: str
@@ -90,6 +110,12 @@ class RoleUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
 
+class PermissionCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    resource: str
+    action: str
+
 class PermissionResponse(BaseModel):
     id: uuid.UUID
     name: str
@@ -111,6 +137,7 @@ class TenantBase(BaseModel):
     name: str
     contact_email: str
     plan: Optional[str] = "basic"
+    timezone: Optional[Timezone] = None  # IANA name for attendance days
 
 class TenantCreate(TenantBase):
     pass
@@ -119,6 +146,7 @@ class TenantUpdate(BaseModel):
     name: Optional[str] = None
     contact_email: Optional[str] = None
     plan: Optional[str] = None
+    timezone: Optional[Timezone] = None
 
 class TenantResponse(TenantBase):
     id: uuid.UUID
@@ -283,6 +311,7 @@ class AttendanceLogBase(BaseModel):
     work_mode: Optional[str] = None
     policy_applied: Optional[str] = None
     status: Optional[str] = None
+    geofence_status: Optional[str] = None  # inside, outside, no_location
 
 class AttendanceLogCreate(AttendanceLogBase):
     tenant_id: uuid.UUID
@@ -301,6 +330,33 @@ class ClockInOutRequest(BaseModel):
     location_address: Optional[str] = None
     device_info: Optional[str] = None
 
+class ClockEvent(BaseModel):
+    idempotency_key: str  # generated on the device, unique per punch
+    action: str  # clock_in, clock_out
+    timestamp: datetime  # when the punch happened on the device
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    location_address: Optional[str] = None
+    device_info: Optional[str] = None
+
+    @validator('idempotency_key')
+    def idempotency_key_length(cls, v):
+        if not 1 <= len(v) <= 100:
+            raise ValueError('Idempotency key must be 1 to 100 characters long')
+        return v
+
+class ClockEventBatch(BaseModel):
+    events: List[ClockEvent]  # in the order they happened
+
+class RejectedClockEvent(BaseModel):
+    idempotency_key: str
+    reason: str
+
+class ClockEventBatchResponse(BaseModel):
+    accepted: int
+    duplicates: int
+    rejected: List[RejectedClockEvent]
+
 class AttendanceSummaryResponse(BaseModel):
     date: date
     total_records: int
@@ -0,0 +1,198 @@
+# shift_policies.py
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from auth import Principal
+from models import Policy, PolicyAssignment
+
+# How often a worker re-checks a tenant's policy fingerprint for changes made elsewhere
+SHIFT_POLICY_RECHECK_SECONDS = float(os.getenv("SHIFT_POLICY_RECHECK_SECONDS", "10"))
+
+
+@dataclass(frozen=True)
+class Shift:
+    """A time policy's rules, parsed once when the tenant is compiled"""
+    policy_id: object
+    policy_name: str
+    start_time: Optional[dt_time]
+    end_time: str
+    shift_timing: str
+    shift_type: str
+    work_mode: str
+    grace_period: float
+    late_threshold: float
+
+    @classmethod
+    def from_policy(cls, policy_id, name: str, rules: dict) -> "Shift":
+        start = rules.get('start_time', '09:00')
+        end = rules.get('end_time', '18:00')
+        try:
+            start_time = datetime.strptime(start, "%H:%M").time()
+        except (TypeError, ValueError):
+            print(f"[WARN] Policy '{name}' has an invalid start_time {start!r}; lateness is not computed.")
+            start_time = None
+        return cls(
+            policy_id=policy_id,
+            policy_name=name,
+            start_time=start_time,
+            end_time=end,
+            shift_timing=f"{start}-{end}",
+            shift_type=rules.get('shift_type', 'Regular'),
+            work_mode=rules.get('work_mode', 'Office'),
+            grace_period=rules.get('grace_period', 15),
+            late_threshold=rules.get('late_threshold', 30),
+        )
+
+    def clock_in_status(self, clock_in: datetime) -> str:
+        """On Time / Late / Very Late for a clock-in at ``clock_in``"""
+        if self.start_time is None:
+            return "On Time"
+        start_dt = datetime.combine(clock_in.date(), self.start_time)
+        clock_in_dt = datetime.combine(clock_in.date(), clock_in.time())
+        minutes_late = (clock_in_dt - start_dt).total_seconds() / 60
+        if minutes_late <= self.grace_period:
+            return "On Time"
+        if minutes_late <= self.late_threshold:
+            return "Late"
+        return "Very Late"
+
+
+class CompiledShifts:
+    """Active time policies of one tenant with their assignment targets"""
+
+    __slots__ = ("assignments", "fingerprint", "checked_at", "resolved")
+
+    def __init__(self, assignments: List[Tuple[object, object, object, Shift]], fingerprint):
+        # (user_id, department_id, branch_id, shift) in assignment order
+        self.assignments = assignments
+        self.fingerprint = fingerprint
+        self.checked_at = time.monotonic()
+        self.resolved: Dict[tuple, Optional[Shift]] = {}
+
+    def resolve(self, user_id, department_id, branch_id) -> Optional[Shift]:
+        key = (user_id, department_id, branch_id)
+        if key in self.resolved:
+            return self.resolved[key]
+        shift = None
+        for a_user, a_department, a_branch, candidate in self.assignments:
+            # Same matching rule as the original per-punch policy query
+            if (
+                a_user == user_id
+                or (a_department is not None and a_department == department_id)
+                or a_user is None
+                or a_department is None
+                or a_branch is None
+                or (branch_id is not None and a_branch == branch_id)
+            ):
+                shift = candidate
+                break
+        self.resolved[key] = shift
+        return shift
+
+    def forget_user(self, user_id):
+        for key in [key for key in self.resolved if key[0] == user_id]:
+            self.resolved.pop(key, None)
+
+
+class ShiftPolicyCache:
+    """Per-tenant cache of parsed shift policies for the clock-in hot path.
+
+    A tenant's active time policies and assignments are loaded in one query
+    and each user's shift is resolved in memory and memoized. The tenant is
+    reloaded when a policy or assignment changes on this worker
+    (``invalidate``) and, for changes made by other workers, when the
+    tenant's policy fingerprint moves.
+    """
+
+    def __init__(self, recheck_seconds: float):
+        self.recheck_seconds = recheck_seconds
+        self._tenants: Dict[str, CompiledShifts] = {}
+        self._lock = threading.Lock()
+        self.compilations = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _fingerprint(self, db: Session, tenant_id):
+        policies = select(
+            func.count(Policy.id), func.max(func.coalesce(Policy.updated_at, Policy.created_at))
+        ).where(Policy.tenant_id == tenant_id).subquery()
+        assignments = select(
+            func.count(PolicyAssignment.id), func.max(PolicyAssignment.assigned_at)
+        ).where(PolicyAssignment.tenant_id == tenant_id).subquery()
+        return tuple(db.execute(select(policies, assignments)).one())
+
+    def _load(self, db: Session, tenant_id, fingerprint) -> CompiledShifts:
+        rows = db.query(
+            PolicyAssignment.user_id, PolicyAssignment.department_id, PolicyAssignment.branch_id,
+            Policy.id, Policy.name, Policy.rules
+        ).join(Policy, Policy.id == PolicyAssignment.policy_id).filter(
+            PolicyAssignment.tenant_id == tenant_id,
+            Policy.type == "time",
+            Policy.is_active == True
+        ).order_by(PolicyAssignment.assigned_at, PolicyAssignment.id).all()
+        shifts: Dict[object, Shift] = {}
+        assignments = []
+        for user_id, department_id, branch_id, policy_id, name, rules in rows:
+            shift = shifts.get(policy_id)
+            if shift is None:
+                shift = shifts[policy_id] = Shift.from_policy(policy_id, name, rules or {})
+            assignments.append((user_id, department_id, branch_id, shift))
+        self.compilations += 1
+        return CompiledShifts(assignments, fingerprint)
+
+    def tenant(self, db: Session, tenant_id) -> CompiledShifts:
+        key = str(tenant_id)
+        compiled = self._tenants.get(key)
+        if compiled is not None and time.monotonic() - compiled.checked_at < self.recheck_seconds:
+            return compiled
+        fingerprint = self._fingerprint(db, tenant_id)
+        if compiled is not None and compiled.fingerprint == fingerprint:
+            compiled.checked_at = time.monotonic()
+            return compiled
+        compiled = self._load(db, tenant_id, fingerprint)
+        with self._lock:
+            self._tenants[key] = compiled
+        return compiled
+
+    def shift_for(self, db: Session, principal: Principal) -> Optional[Shift]:
+        compiled = self.tenant(db, principal.tenant_id)
+        key = (principal.id, principal.department_id, principal.branch_id)
+        if key in compiled.resolved:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return compiled.resolve(principal.id, principal.department_id, principal.branch_id)
+
+    def invalidate(self, tenant_id=None):
+        """Reload one tenant's policies on next use, or every tenant's"""
+        with self._lock:
+            if tenant_id is None:
+                self._tenants.clear()
+            else:
+                self._tenants.pop(str(tenant_id), None)
+
+    def invalidate_user(self, tenant_id, user_id):
+        """Re-resolve one user's shift, e.g. after a department change"""
+        compiled = self._tenants.get(str(tenant_id))
+        if compiled is not None:
+            compiled.forget_user(user_id)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "tenants": len(self._tenants),
+            "compilations": self.compilations,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+shift_policy_cache = ShiftPolicyCache(SHIFT_POLICY_RECHECK_SECONDS)
@@ -0,0 +1,76 @@
+# timeutils.py
+"""Local calendar dates <-> UTC timestamp ranges.
+
+Timestamps are stored in UTC. Attendance days are calendar days in the
+user's timezone (the user's own setting, else the tenant's, else
+DEFAULT_TIMEZONE). Filters on timestamp columns use half-open UTC ranges
+``[start, end)`` so they stay index range scans.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Timezone for users and tenants that have none configured
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+@lru_cache(maxsize=1024)
+def _zone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"[WARN] Unknown timezone {name!r}, using {DEFAULT_TIMEZONE}.")
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def zone(name: Optional[str]) -> ZoneInfo:
+    """ZoneInfo for an IANA name, falling back to DEFAULT_TIMEZONE"""
+    return _zone(name or DEFAULT_TIMEZONE)
+
+
+def local_now(tz_name: Optional[str], now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.now(timezone.utc)).astimezone(zone(tz_name))
+
+
+def local_date(moment: datetime, tz_name: Optional[str]) -> date:
+    """Calendar date of a timestamp in the given timezone (naive means UTC)"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(zone(tz_name)).date()
+
+
+def local_today(tz_name: Optional[str], now: Optional[datetime] = None) -> date:
+    return local_now(tz_name, now).date()
+
+
+def day_start_utc(day: date, tz_name: Optional[str]) -> datetime:
+    """UTC instant at which a local calendar day begins (DST-aware)"""
+    return datetime.combine(day, time.min, tzinfo=zone(tz_name)).astimezone(timezone.utc)
+
+
+def utc_range(start: Optional[date], end: Optional[date], tz_name: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Half-open UTC range covering local days ``start``..``end`` inclusive; either side may be open"""
+    lower = day_start_utc(start, tz_name) if start else None
+    upper = day_start_utc(end + timedelta(days=1), tz_name) if end else None
+    return lower, upper
+
+
+def between(column, start: Optional[date], end: Optional[date], tz_name: Optional[str]) -> list:
+    """Sargable filters selecting rows whose timestamp ``column`` falls on local days start..end"""
+    lower, upper = utc_range(start, end, tz_name)
+    filters = []
+    if lower is not None:
+        filters.append(column >= lower)
+    if upper is not None:
+        filters.append(column < upper)
+    return filters
@@ -0,0 +1,121 @@
+# token_store.py
+import os
+import secrets
+from abc import ABC, abstractmethod
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from auth import hash_token
+from models import ResetToken
+
+# Which store backs password reset tokens: "postgres" (shared) or "memory" (tests, single worker)
+RESET_TOKEN_STORE = os.getenv("RESET_TOKEN_STORE", "postgres")
+RESET_TOKEN_TTL_MINUTES = int(os.getenv("RESET_TOKEN_TTL_MINUTES", "60"))
+INVITE_TOKEN_TTL_HOURS = int(os.getenv("INVITE_TOKEN_TTL_HOURS", "72"))
+# Expired tokens are evicted in bulk at most this often
+RESET_TOKEN_PURGE_SECONDS = float(os.getenv("RESET_TOKEN_PURGE_SECONDS", "300"))
+
+
+class TokenStore(ABC):
+    """Single-use, expiring tokens mapped to a user id.
+
+    Only a SHA-256 digest of each token is stored. ``issue`` and ``consume``
+    take the request's session so the token change commits together with the
+    caller's own writes.
+    """
+
+    def __init__(self, purge_seconds: float = RESET_TOKEN_PURGE_SECONDS):
+        self.purge_seconds = purge_seconds
+        self._next_purge = 0.0
+
+    def issue(self, db: Session, user_id, ttl: timedelta) -> str:
+        token = secrets.token_urlsafe(32)
+        self._store(db, hash_token(token), str(user_id), datetime.now(timezone.utc) + ttl)
+        self._maybe_purge(db)
+        return token
+
+    def consume(self, db: Session, token: str) -> Optional[str]:
+        """Return the token's user id and remove it, or None if unknown or expired"""
+        return self._take(db, hash_token(token), datetime.now(timezone.utc))
+
+    def _maybe_purge(self, db: Session):
+        now = time.monotonic()
+        if now >= self._next_purge:
+            self._next_purge = now + self.purge_seconds
+            self.purge_expired(db)
+
+    @abstractmethod
+    def _store(self, db: Session, token_hash: str, user_id: str, expires_at: datetime):
+        ...
+
+    @abstractmethod
+    def _take(self, db: Session, token_hash: str, now: datetime) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def purge_expired(self, db: Session) -> int:
+        ...
+
+
+class InMemoryTokenStore(TokenStore):
+    """Process-local store for tests and single-worker development"""
+
+    def __init__(self, purge_seconds: float = RESET_TOKEN_PURGE_SECONDS):
+        super().__init__(purge_seconds)
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def _store(self, db, token_hash, user_id, expires_at):
+        with self._lock:
+            self._tokens[token_hash] = (user_id, expires_at)
+
+    def _take(self, db, token_hash, now):
+        with self._lock:
+            entry = self._tokens.pop(token_hash, None)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0]
+
+    def purge_expired(self, db=None) -> int:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            expired = [h for h, (_, expires_at) in self._tokens.items() if expires_at <= now]
+            for token_hash in expired:
+                del self._tokens[token_hash]
+        return len(expired)
+
+
+class PostgresTokenStore(TokenStore):
+    """Store shared by every worker and node through the reset_tokens table"""
+
+    def _store(self, db, token_hash, user_id, expires_at):
+        db.add(ResetToken(token_hash=token_hash, user_id=user_id, expires_at=expires_at))
+
+    def _take(self, db, token_hash, now):
+        # DELETE ... RETURNING makes the token single-use even under concurrent resets
+        row = db.execute(
+            delete(ResetToken)
+            .where(ResetToken.token_hash == token_hash, ResetToken.expires_at > now)
+            .returning(ResetToken.user_id)
+        ).first()
+        return str(row[0]) if row else None
+
+    def purge_expired(self, db) -> int:
+        result = db.execute(delete(ResetToken).where(ResetToken.expires_at <= datetime.now(timezone.utc)))
+        return result.rowcount
+
+
+def create_token_store(kind: str = RESET_TOKEN_STORE) -> TokenStore:
+    if kind == "memory":
+        return InMemoryTokenStore()
+    if kind == "postgres":
+        return PostgresTokenStore()
+    raise ValueError(f"Unknown token store: {kind}")
+
+
+reset_token_store = create_token_store()
@@ -31,6 +31,7 @@ class ApiService {
   static Future<void> clearToken() async {
     print('Clearing token');
     _token = null;
+    _etagCache.clear();
     
     // Remove token from shared preferences
     final prefs = await SharedPreferences.getInstance();
@@ -51,6 +52,26 @@ class ApiService {
     return headers;
   }
 
+  // Last 200 response per URL for endpoints that send an ETag; a 304 reuses it
+  static final Map<String, http.Response> _etagCache = {};
+
+  static Future<http.Response> _conditionalGet(Uri uri) async {
+    final key = uri.toString();
+    final cached = _etagCache[key];
+    final etag = cached?.headers['etag'];
+    final response = await http.get(
+      uri,
+      headers: {..._headers, if (etag != null) 'If-None-Match': etag},
+    );
+    if (response.statusCode == 304 && cached != null) {
+      return cached;
+    }
+    if (response.statusCode == 200 && response.headers['etag'] != null) {
+      _etagCache[key] = response;
+    }
+    return response;
+  }
+
   // Auth endpoints
   static Future<List<dynamic>> fetchTenants() async {
     print('Fetching tenants from: $baseUrl/admin/tenants');
@@ -165,6 +186,30 @@ class ApiService {
     }
   }
 
+  // History endpoints return one page at a time (newest first) and put the
+  // cursor for the next page in X-Next-Cursor
+  static Future<List<dynamic>> _getHistory(
+    String path,
+    Map<String, String> queryParams, {
+    required bool allPages,
+    required String errorMessage,
+  }) async {
+    final items = <dynamic>[];
+    String? cursor;
+    do {
+      final params = {...queryParams, if (cursor != null) 'cursor': cursor};
+      final response = await _conditionalGet(
+        Uri.parse('$baseUrl$path').replace(queryParameters: params),
+      );
+      if (response.statusCode != 200) {
+        throw Exception('$errorMessage: ${response.body}');
+      }
+      items.addAll(jsonDecode(response.body));
+      cursor = response.headers['x-next-cursor'];
+    } while (allPages && cursor != null);
+    return items;
+  }
+
   static Future<List<dynamic>> getMyAttendanceRecords({
     String? startDate,
     String? endDate,
@@ -173,15 +218,9 @@ class ApiService {
     if (startDate != null) queryParams['start_date'] = startDate;
     if (endDate != null) queryParams['end_date'] = endDate;
 
-    final response = await http.get(
-      Uri.parse('$baseUrl/attendance/my-records').replace(queryParameters: queryParams),
-      headers: _headers,
-    );
-    if (response.statusCode == 200) {
-      return jsonDecode(response.body);
-    } else {
-      throw Exception('Failed to get attendance records: ${response.body}');
-    }
+    // A date range is bounded, so fetch all of it; otherwise just the latest page
+    return _getHistory('/attendance/my-records', queryParams,
+        allPages: startDate != null, errorMessage: 'Failed to get attendance records');
   }
 
   static Future<List<dynamic>> getMyAttendanceLogs({String? date}) async {
@@ -189,15 +228,8 @@ class ApiService {
     final queryParams = <String, String>{'timezone': tz};
     if (date != null) queryParams['date'] = date;
 
-    final response = await http.get(
-      Uri.parse('$baseUrl/attendance/my-logs').replace(queryParameters: queryParams),
-      headers: _headers,
-    );
-    if (response.statusCode == 200) {
-      return jsonDecode(response.body);
-    } else {
-      throw Exception('Failed to get attendance logs: ${response.body}');
-    }
+    return _getHistory('/attendance/my-logs', queryParams,
+        allPages: date != null, errorMessage: 'Failed to get attendance logs');
   }
 
   static Future<List<dynamic>> getMyAttendanceLogsForRange({
@@ -209,15 +241,8 @@ class ApiService {
     if (startDate != null) queryParams['start_date'] = startDate;
     if (endDate != null) queryParams['end_date'] = endDate;
 
-    final response = await http.get(
-      Uri.parse('$baseUrl/attendance/my-logs').replace(queryParameters: queryParams),
-      headers: _headers,
-    );
-    if (response.statusCode == 200) {
-      return jsonDecode(response.body);
-    } else {
-      throw Exception('Failed to get attendance logs: ${response.body}');
-    }
+    return _getHistory('/attendance/my-logs', queryParams,
+        allPages: startDate != null, errorMessage: 'Failed to get attendance logs');
   }
 
   static Future<Map<String, dynamic>> getCurrentSession() async {
@@ -248,9 +273,8 @@ class ApiService {
   static Future<List<dynamic>> listPolicies({String? policyType}) async {
     final queryParams = <String, String>{};
     if (policyType != null) queryParams['policy_type'] = policyType;
-    final response = await http.get(
+    final response = await _conditionalGet(
       Uri.parse('$baseUrl/policies').replace(queryParameters: queryParams),
-      headers: _headers,
     );
     if (response.statusCode == 200) {
       return jsonDecode(response.body);
@@ -300,9 +324,8 @@ class ApiService {
     final queryParams = <String, String>{};
     if (year != null) queryParams['year'] = year.toString();
 
-    final response = await http.get(
+    final response = await _conditionalGet(
       Uri.parse('$baseUrl/holidays').replace(queryParameters: queryParams),
-      headers: _headers,
     );
     if (response.statusCode == 200) {
       return jsonDecode(response.body);
@@ -325,9 +348,8 @@ class ApiService {
   }
 
   static Future<List<dynamic>> listWeekOffs() async {
-    final response = await http.get(
+    final response = await _conditionalGet(
       Uri.parse('$baseUrl/week-offs'),
-      headers: _headers,
     );
     if (response.statusCode == 200) {
       return jsonDecode(response.body);
@@ -351,9 +373,8 @@ class ApiService {
 
   // Leave Management endpoints
   static Future<List<dynamic>> listLeaveTypes() async {
-    final response = await http.get(
+    final response = await _conditionalGet(
       Uri.parse('$baseUrl/leave-types'),
-      headers: _headers,
     );
     if (response.statusCode == 200) {
       return jsonDecode(response.body);
@@ -479,6 +500,20 @@ class ApiService {
     }
   }
 
+  // Who in the tenant is clocked in right now
+  static Future<Map<String, dynamic>> getPresenceRoster() async {
+    final response = await http.get(
+      Uri.parse('$baseUrl/manager/presence'),
+      headers: _headers,
+    );
+
+    if (response.statusCode == 200) {
+      return jsonDecode(response.body);
+    } else {
+      throw Exception('Failed to get presence roster: ${response.body}');
+    }
+  }
+
   // User endpoints
   static Future<Map<String, dynamic>> getUserProfile() async {
     print('Making getUserProfile request to: $baseUrl/user/profile');
@@ -72,6 +72,29 @@ class AttendanceService extends BaseApiService {
     }
   }
 
+  // Upload punches queued while offline. Each event needs an
+  // 'idempotency_key' (unique per punch), 'action' and an ISO-8601
+  // 'timestamp'; re-sending the same events after a failure is safe.
+  static Future<Map<String, dynamic>> uploadClockEvents(
+    List<Map<String, dynamic>> events,
+  ) async {
+    try {
+      final response = await http.post(
+        Uri.parse('${BaseApiService.baseUrlValue}/attendance/clock-events/batch'),
+        headers: BaseApiService.requestHeaders,
+        body: jsonEncode({'events': events}),
+      );
+
+      if (response.statusCode == 200) {
+        return jsonDecode(response.body);
+      } else {
+        throw Exception('Failed to upload clock events: ${response.body}');
+      }
+    } catch (e) {
+      throw Exception('Error uploading clock events: $e');
+    }
+  }
+
   static Future<Map<String, dynamic>> getCurrentSession() async {
     try {
       final response = await http.get(
@@ -244,6 +267,32 @@ class AttendanceService extends BaseApiService {
     }
   }
 
+  // History endpoints return one page at a time (newest first) and put the
+  // cursor for the next page in X-Next-Cursor
+  static Future<List<Map<String, dynamic>>> _getHistory(
+    String path,
+    Map<String, String> queryParams, {
+    required bool allPages,
+    required String errorMessage,
+  }) async {
+    final items = <Map<String, dynamic>>[];
+    String? cursor;
+    do {
+      final params = {...queryParams, if (cursor != null) 'cursor': cursor};
+      final response = await http.get(
+        Uri.parse('${BaseApiService.baseUrlValue}$path').replace(queryParameters: params),
+        headers: BaseApiService.requestHeaders,
+      );
+      if (response.statusCode != 200) {
+        throw Exception('$errorMessage: ${response.body}');
+      }
+      final List<dynamic> data = jsonDecode(response.body);
+      items.addAll(data.cast<Map<String, dynamic>>());
+      cursor = response.headers['x-next-cursor'];
+    } while (allPages && cursor != null);
+    return items;
+  }
+
   static Future<List<Map<String, dynamic>>> getMyAttendanceRecords({
     String? startDate,
     String? endDate,
@@ -253,20 +302,9 @@ class AttendanceService extends BaseApiService {
       if (startDate != null) queryParams['start_date'] = startDate;
       if (endDate != null) queryParams['end_date'] = endDate;
 
-      final uri = Uri.parse('${BaseApiService.baseUrlValue}/attendance/my-records')
-          .replace(queryParameters: queryParams);
-
-      final response = await http.get(
-        uri,
-        headers: BaseApiService.requestHeaders,
-      );
-
-      if (response.statusCode == 200) {
-        final List<dynamic> data = jsonDecode(response.body);
-        return data.cast<Map<String, dynamic>>();
-      } else {
-        throw Exception('Failed to get attendance records: ${response.body}');
-      }
+      // A date range is bounded, so fetch all of it; otherwise just the latest page
+      return await _getHistory('/attendance/my-records', queryParams,
+          allPages: startDate != null, errorMessage: 'Failed to get attendance records');
     } catch (e) {
       throw Exception('Error getting attendance records: $e');
     }
@@ -277,20 +315,8 @@ class AttendanceService extends BaseApiService {
       final queryParams = <String, String>{};
       if (date != null) queryParams['date'] = date;
 
-      final uri = Uri.parse('${BaseApiService.baseUrlValue}/attendance/my-logs')
-          .replace(queryParameters: queryParams);
-
-      final response = await http.get(
-        uri,
-        headers: BaseApiService.requestHeaders,
-      );
-
-      if (response.statusCode == 200) {
-        final List<dynamic> data = jsonDecode(response.body);
-        return data.cast<Map<String, dynamic>>();
-      } else {
-        throw Exception('Failed to get attendance logs: ${response.body}');
-      }
+      return await _getHistory('/attendance/my-logs', queryParams,
+          allPages: date != null, errorMessage: 'Failed to get attendance logs');
     } catch (e) {
       throw Exception('Error getting attendance logs: $e');
     }
@@ -305,39 +331,46 @@ class AttendanceService extends BaseApiService {
       if (startDate != null) queryParams['start_date'] = startDate;
       if (endDate != null) queryParams['end_date'] = endDate;
 
-      final uri = Uri.parse('${BaseApiService.baseUrlValue}/attendance/my-logs')
-          .replace(queryParameters: queryParams);
+      return await _getHistory('/attendance/my-logs', queryParams,
+          allPages: startDate != null, errorMessage: 'Failed to get attendance logs for range');
+    } catch (e) {
+      throw Exception('Error getting attendance logs for range: $e');
+    }
+  }
 
+  static Future<Map<String, dynamic>> getMyAttendanceDetail(String date) async {
+    try {
       final response = await http.get(
-        uri,
+        Uri.parse('${BaseApiService.baseUrlValue}/attendance/my-detail/$date'),
         headers: BaseApiService.requestHeaders,
       );
 
       if (response.statusCode == 200) {
-        final List<dynamic> data = jsonDecode(response.body);
-        return data.cast<Map<String, dynamic>>();
+        return jsonDecode(response.body);
       } else {
-        throw Exception('Failed to get attendance logs for range: ${response.body}');
+        throw Exception('Failed to get attendance detail: ${response.body}');
       }
     } catch (e) {
-      throw Exception('Error getting attendance logs for range: $e');
+      throw Exception('Error getting attendance detail: $e');
     }
   }
 
-  static Future<Map<String, dynamic>> getMyAttendanceDetail(String date) async {
+  // Detail of every recorded day in a month, in one request
+  static Future<List<Map<String, dynamic>>> getMyAttendanceMonthDetail(int year, int month) async {
     try {
       final response = await http.get(
-        Uri.parse('${BaseApiService.baseUrlValue}/attendance/my-detail/$date'),
+        Uri.parse('${BaseApiService.baseUrlValue}/attendance/my-detail/month/$year/$month'),
         headers: BaseApiService.requestHeaders,
       );
 
       if (response.statusCode == 200) {
-        return jsonDecode(response.body);
+        final List<dynamic> data = jsonDecode(response.body);
+        return data.cast<Map<String, dynamic>>();
       } else {
-        throw Exception('Failed to get attendance detail: ${response.body}');
+        throw Exception('Failed to get attendance month detail: ${response.body}');
       }
     } catch (e) {
-      throw Exception('Error getting attendance detail: $e');
+      throw Exception('Error getting attendance month detail: $e');
     }
   }
 
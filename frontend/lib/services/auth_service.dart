@@ -45,6 +45,7 @@ class AuthService extends BaseApiService {
       if (response.statusCode == 200) {
         final data = json.decode(response.body);
         await BaseApiService.setToken(data['access_token']);
+        await BaseApiService.setRefreshToken(data['refresh_token']);
         return {
           'success': true,
           'data': data,
@@ -120,6 +121,7 @@ class AuthService extends BaseApiService {
       await http.post(
         Uri.parse('${BaseApiService.baseUrlValue}/auth/logout'),
         headers: BaseApiService.requestHeaders,
+        body: json.encode({'refresh_token': BaseApiService.refreshToken}),
       );
     } catch (e) {
       print('Logout error: $e');
@@ -150,11 +152,13 @@ class AuthService extends BaseApiService {
       final response = await http.post(
         Uri.parse('${BaseApiService.baseUrlValue}/auth/refresh'),
         headers: BaseApiService.requestHeaders,
+        body: json.encode({'refresh_token': BaseApiService.refreshToken}),
       );
 
       if (response.statusCode == 200) {
         final data = jsonDecode(response.body);
         await BaseApiService.setToken(data['access_token']);
+        await BaseApiService.setRefreshToken(data['refresh_token']);
         return data;
       } else {
         throw Exception('Token refresh failed: ${response.body}');
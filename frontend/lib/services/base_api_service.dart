@@ -3,12 +3,15 @@ import 'package:shared_preferences/shared_preferences.dart';
 class BaseApiService {
   static const String baseUrl = 'http://localhost:8000';
   static const String _tokenKey = 'auth_token';
+  static const String _refreshTokenKey = 'refresh_token';
   static String? _token;
+  static String? _refreshToken;
 
   static Future<void> initialize() async {
     // Load token from shared preferences on app start
     final prefs = await SharedPreferences.getInstance();
     _token = prefs.getString(_tokenKey);
+    _refreshToken = prefs.getString(_refreshTokenKey);
     print('Loaded token from storage: ${_token != null ? _token!.substring(0, _token!.length > 10 ? 10 : _token!.length) + '...' : 'null'}');
   }
 
@@ -22,13 +25,27 @@ class BaseApiService {
     print('Token saved to storage');
   }
 
+  static Future<void> setRefreshToken(String? token) async {
+    _refreshToken = token;
+    final prefs = await SharedPreferences.getInstance();
+    if (token == null) {
+      await prefs.remove(_refreshTokenKey);
+    } else {
+      await prefs.setString(_refreshTokenKey, token);
+    }
+  }
+
+  static String? get refreshToken => _refreshToken;
+
   static Future<void> clearToken() async {
     print('Clearing token');
     _token = null;
+    _refreshToken = null;
     
     // Remove token from shared preferences
     final prefs = await SharedPreferences.getInstance();
     await prefs.remove(_tokenKey);
+    await prefs.remove(_refreshTokenKey);
     print('Token removed from storage');
   }
 